@@ -76,11 +76,37 @@ WSGI_APPLICATION = 'taskapp.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # SQLite backend that starts transactions with BEGIN IMMEDIATE, so
+        # checking capacity and saving a task can not interleave with other writers
+        'ENGINE': 'tasks.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Applied to every new SQLite connection. WAL lets readers work while
+# one writer commits, and writers wait for the lock instead of failing.
+TASKS_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+}
+
+
+# Cache alias shared by all workers for the availability singleton,
+# None keeps it in process memory, read again when the data version changes
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+TASKS_AVAILABILITY_CACHE = None
+
+# Seconds the in process availability is used before the data version
+# is checked again, changes saved by this process are seen at once
+
+TASKS_AVAILABILITY_TTL = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -118,6 +144,18 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Outside debug, collectstatic writes content hashed file names so static
+# files, like the vendored plotly.js, can be cached by browsers for good
+
+if not DEBUG:
+    STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
+
+# Uploaded files waiting for the import worker
+
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -10,3 +10,6 @@ class TasksConfig(AppConfig):
     """
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tasks'
+
+    def ready(self):
+        from . import signals  # pylint: disable=import-outside-toplevel,unused-import
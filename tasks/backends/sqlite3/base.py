@@ -0,0 +1,32 @@
+"""
+SQLite database backend starting transactions in a configured mode
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite database wrapper taking OPTIONS transaction_mode. With IMMEDIATE
+    the write lock is taken when a transaction begins, so a capacity check
+    made inside the transaction still holds when its insert commits, and
+    writers wait for busy_timeout instead of failing as locked.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        mode = params.pop('transaction_mode', None)
+        if mode is not None and mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'transaction_mode must be one of {", ".join(TRANSACTION_MODES)}')
+        return params
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        if mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {mode.upper()}')
@@ -0,0 +1,123 @@
+"""
+Columnar pandas engine parsing and validating imported tasks
+"""
+
+import codecs
+import json
+import pandas as pd
+
+from .utils import IMPORT_BATCH_SIZE, iter_batches, iter_json_tasks
+
+COLUMNS = ('description', 'category', 'start date', 'deadline',
+    'estimated duration', 'elapsed time', 'status')
+
+# Largest value of an integer field
+MAX_WHOLE_NUMBER = 2 ** 31 - 1
+
+STATUS_CODES = {
+    'not started': 'NS',
+    'ongoing': 'OG',
+    'completed': 'C',
+}
+
+
+def normalize_columns(frame):
+    """
+    Lower cases headers of frame, the last of
+    headers that only differ in case is kept
+    """
+    frame.columns = frame.columns.astype(str).str.strip().str.lower()
+    return frame.loc[:, ~frame.columns.duplicated(keep='last')]
+
+
+def frame_of_rows(rows):
+    """
+    Creates frame of imported rows given as dicts
+    """
+    return normalize_columns(pd.DataFrame.from_records(rows))
+
+
+def read_csv_frames(file, chunk_size=IMPORT_BATCH_SIZE):
+    """
+    Yields frames of at most chunk_size rows of
+    semicolon separated file, every value as text
+    """
+    try:
+        reader = pd.read_csv(file, sep=';', dtype=str, keep_default_na=False,
+            encoding='utf-8-sig', chunksize=chunk_size)
+    except pd.errors.EmptyDataError:
+        return
+    with reader:
+        for frame in reader:
+            yield normalize_columns(frame)
+
+
+def read_json_frames(file, chunk_size=IMPORT_BATCH_SIZE):
+    """
+    Yields frames of at most chunk_size objects of JSON array in file
+    """
+    for rows in iter_batches(iter_json_tasks(file), chunk_size):
+        yield frame_of_rows(rows)
+
+
+def read_ndjson_frames(file, chunk_size=IMPORT_BATCH_SIZE):
+    """
+    Yields frames of at most chunk_size lines of file with one JSON object per line
+    """
+    lines = (line for line in codecs.iterdecode(file, 'utf-8-sig') if line.strip())
+    for rows in iter_batches(map(json.loads, lines), chunk_size):
+        yield frame_of_rows(rows)
+
+
+def read_frames(file, chunk_size=IMPORT_BATCH_SIZE):
+    """
+    Yields frames of uploaded JSON, NDJSON or CSV file,
+    None if file type is not allowed
+    """
+    if file.name.endswith("ndjson"):
+        return read_ndjson_frames(file, chunk_size)
+    if file.name.endswith("json"):
+        return read_json_frames(file, chunk_size)
+    if file.name.endswith("csv"):
+        return read_csv_frames(file, chunk_size)
+    return None
+
+
+def parse_whole_numbers(column):
+    """
+    Parses numbers of column, values that are not whole numbers
+    or do not fit a non-negative integer field become NaN
+    """
+    numbers = pd.to_numeric(column, errors='coerce')
+    return numbers.where((numbers % 1 == 0) & numbers.between(0, MAX_WHOLE_NUMBER))
+
+
+def parse_frame(frame):
+    """
+    Parses imported frame into task fields. Rows missing any column,
+    or with dates in day-month-year or durations that do not parse,
+    are flagged in column valid. The external id column is optional.
+    """
+    external_id = frame['external id'] if 'external id' in frame.columns \
+        else pd.Series('', index=frame.index)
+    frame = frame.reindex(columns=list(COLUMNS))
+    start = pd.to_datetime(frame['start date'].astype('string').str.strip(),
+        format='%d-%m-%Y', errors='coerce')
+    deadline = pd.to_datetime(frame['deadline'].astype('string').str.strip(),
+        format='%d-%m-%Y', errors='coerce')
+    estimated = parse_whole_numbers(frame['estimated duration'])
+    elapsed = parse_whole_numbers(frame['elapsed time'])
+    valid = frame.notna().all(axis=1) & start.notna() & deadline.notna() \
+        & estimated.notna() & elapsed.notna()
+    return pd.DataFrame({
+        'description': frame['description'].fillna('').astype(str),
+        'category': frame['category'].fillna('').astype(str),
+        'start': start.dt.date,
+        'deadline': deadline.dt.date,
+        'estimated_duration': estimated.fillna(0).astype('int64'),
+        'actual_duration': elapsed.fillna(0).astype('int64'),
+        'status': frame['status'].astype('string').str.lower()
+            .map(STATUS_CODES).fillna('NS'),
+        'external_id': external_id.fillna('').astype(str).str.strip(),
+        'valid': valid,
+    }, index=frame.index)
@@ -0,0 +1,84 @@
+"""
+Streaming export of tasks in the formats tasks are imported in
+"""
+
+import csv
+import json
+
+EXPORT_CHUNK_SIZE = 2000
+
+COLUMNS = ('Description', 'Category', 'Start date', 'Deadline',
+    'Estimated duration', 'Elapsed time', 'Status', 'External id')
+
+
+class Echo:
+    """
+    File like object handing written lines back to the csv writer
+    """
+
+    def write(self, value):
+        """
+        Returns value instead of storing it
+        """
+        return value
+
+
+def task_row(task):
+    """
+    Creates export row of task with day-month-year dates
+    """
+    return dict(zip(COLUMNS, (
+        task.description,
+        task.category.name,
+        task.start.strftime('%d-%m-%Y'),
+        task.deadline.strftime('%d-%m-%Y'),
+        task.estimated_duration,
+        task.actual_duration,
+        task.get_status_display(),
+        task.external_id or ''
+    )))
+
+
+def iter_rows(tasks):
+    """
+    Yields export rows of tasks, read from the database in chunks
+    """
+    for task in tasks.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield task_row(task)
+
+
+def iter_csv(tasks):
+    """
+    Yields lines of semicolon separated file of tasks
+    """
+    writer = csv.DictWriter(Echo(), fieldnames=COLUMNS, delimiter=';')
+    yield writer.writeheader()
+    for row in iter_rows(tasks):
+        yield writer.writerow(row)
+
+
+def iter_json(tasks):
+    """
+    Yields parts of JSON array of tasks
+    """
+    separator = '[\n'
+    for row in iter_rows(tasks):
+        yield separator + json.dumps(row, ensure_ascii=False)
+        separator = ',\n'
+    yield '[]\n' if separator == '[\n' else '\n]\n'
+
+
+def iter_ndjson(tasks):
+    """
+    Yields one line of JSON per task
+    """
+    for row in iter_rows(tasks):
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+# Format: (generator, content type, file extension)
+FORMATS = {
+    'csv': (iter_csv, 'text/csv; charset=utf-8', 'csv'),
+    'json': (iter_json, 'application/json', 'json'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson', 'ndjson'),
+}
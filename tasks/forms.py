@@ -3,7 +3,7 @@ Modelform classes
 """
 
 from django import forms
-from .models import Availability, Task
+from .models import Availability, ImportJob, Task
 
 
 class TaskForm(forms.ModelForm):
@@ -58,3 +58,7 @@ class UploadFileForm(forms.Form):
     Import tasks form
     """
     file = forms.FileField()
+    mode = forms.ChoiceField(choices=ImportJob.MODES, initial=ImportJob.add,
+        widget=forms.Select(attrs={'class': 'input'}),
+        help_text='Tasks are matched by external id column, or by description, '
+        'category and start date')
@@ -0,0 +1,110 @@
+"""
+Import worker running uploaded task files as background jobs
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import DatabaseError, close_old_connections, connections, transaction
+from django.utils import timezone
+
+from .columnar import parse_frame, read_frames
+from .models import DataVersion, ImportJob, ImportRow, TaskLoad
+from .utils import IMPORT_BATCH_SIZE, delete_unseen, import_batch, upsert_batch
+
+# SQLite takes one writer at a time, so worker threads take turns writing batches
+write_lock = threading.Lock()
+
+
+def import_frame(job, frame, seen):
+    """
+    Imports parsed frame in mode of job and records
+    its row results, returns actions of rows
+    """
+    if job.mode == ImportJob.add:
+        # Tasks may change between batches, so each gets a new snapshot
+        tasks = import_batch(frame, TaskLoad.get_schedule())
+        actions = [ImportRow.rejected if task is None else ImportRow.added for task in tasks]
+    else:
+        actions, tasks = upsert_batch(frame, seen)
+    ImportRow.objects.bulk_create(
+        ImportRow(job=job, number=job.processed + number,
+            description=description[:200], action=action, task=task)
+        for number, (description, action, task)
+            in enumerate(zip(frame['description'], actions, tasks), 1))
+    job.processed += len(frame)
+    job.accepted += sum(action != ImportRow.rejected for action in actions)
+    job.updated += actions.count(ImportRow.updated)
+    job.unchanged += actions.count(ImportRow.unchanged)
+    job.save(update_fields=['processed', 'accepted', 'updated', 'unchanged'])
+    return actions
+
+
+def iter_frames(job, batch_size):
+    """
+    Yields frames of at most batch_size rows of job file,
+    raises ValueError if file type is not allowed
+    """
+    with job.file.open('rb') as file:
+        frames = read_frames(file, batch_size)
+        if frames is None:
+            raise ValueError('Not allowed file, please import JSON or CSV file.')
+        yield from frames
+
+
+def run_import_job(job, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Imports rows of job file. Every batch is committed with its row
+    results so progress can be read while the job is running, rows
+    before a part of the file that can not be read are kept.
+    Tasks not in file are removed once every row is imported in sync mode.
+    """
+    seen = set()
+    try:
+        for frame in iter_frames(job, batch_size):
+            frame = parse_frame(frame)
+            with write_lock, transaction.atomic():
+                actions = import_frame(job, frame, seen)
+                if ImportRow.added in actions or ImportRow.updated in actions:
+                    DataVersion.bump()
+        if job.mode == ImportJob.sync:
+            with write_lock, transaction.atomic():
+                job.deleted = delete_unseen(seen)
+                job.save(update_fields=['deleted'])
+        job.status = ImportJob.done
+    except (ValueError, TypeError, UnicodeDecodeError, DatabaseError) as error:
+        job.status = ImportJob.failed
+        job.error = f'Could not import row {job.processed + 1}: {error}'[:255]
+    job.finished = timezone.now()
+    job.file.delete(save=False)
+    job.save(update_fields=['status', 'error', 'finished', 'file'])
+    return job
+
+
+def work(poll, once):
+    """
+    Runs waiting jobs one at a time, waits poll seconds
+    when there are none or returns if once is set
+    """
+    try:
+        while True:
+            close_old_connections()
+            job = ImportJob.claim()
+            if job is not None:
+                run_import_job(job)
+            elif once:
+                return
+            else:
+                time.sleep(poll)
+    finally:
+        connections.close_all()
+
+
+def run_worker(workers=1, poll=1.0, once=False):
+    """
+    Runs import jobs on a pool of worker threads
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(work, poll, once) for _ in range(workers)]:
+            future.result()
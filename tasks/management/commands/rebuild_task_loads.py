@@ -0,0 +1,42 @@
+"""
+Command rebuilding committed hours of open tasks
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from tasks.models import Task, TaskLoad
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds or verifies TaskLoad against Task
+    """
+    help = 'Rebuilds committed hours of open tasks, or verifies them with --verify'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+            help='Only report loads that differ from tasks')
+
+    def handle(self, *args, **options):
+        expected = {
+            load.task_id: (load.start, load.deadline, load.hours)
+            for load in map(TaskLoad.of_task, Task.objects.exclude(status=Task.completed))
+        }
+        if options['verify']:
+            stored = {
+                task_id: (start, deadline, hours) for task_id, start, deadline, hours in
+                TaskLoad.objects.values_list('task_id', 'start', 'deadline', 'hours')
+            }
+            wrong = sorted(task_id for task_id in expected.keys() | stored.keys()
+                if expected.get(task_id) != stored.get(task_id))
+            if wrong:
+                raise CommandError(
+                    f'Loads differ for tasks: {", ".join(map(str, wrong))}')
+            self.stdout.write(self.style.SUCCESS(f'{len(stored)} loads verified'))
+            return
+        with transaction.atomic():
+            TaskLoad.objects.all().delete()
+            TaskLoad.objects.bulk_create(
+                TaskLoad(task_id=task_id, start=start, deadline=deadline, hours=hours)
+                for task_id, (start, deadline, hours) in expected.items())
+        self.stdout.write(self.style.SUCCESS(f'{len(expected)} loads rebuilt'))
@@ -0,0 +1,19 @@
+"""
+Command rebuilding full text index of tasks
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from tasks.search import has_search_index, rebuild_search_index
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds full text index from tasks and categories
+    """
+    help = 'Rebuilds full text search index of tasks'
+
+    def handle(self, *args, **options):
+        if not has_search_index():
+            raise CommandError('Full text search index is only available on SQLite')
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
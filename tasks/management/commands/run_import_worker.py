@@ -0,0 +1,26 @@
+"""
+Command running the import worker
+"""
+
+from django.core.management.base import BaseCommand
+from tasks.imports import run_worker
+
+
+class Command(BaseCommand):
+    """
+    Imports uploaded task files waiting as import jobs
+    """
+    help = 'Runs import jobs of uploaded task files until stopped, or once with --once'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+            help='Number of jobs imported at the same time')
+        parser.add_argument('--poll', type=float, default=1.0,
+            help='Seconds to wait when no job is waiting')
+        parser.add_argument('--once', action='store_true',
+            help='Stop when no job is waiting')
+
+    def handle(self, *args, **options):
+        run_worker(options['workers'], options['poll'], options['once'])
+        if options['once']:
+            self.stdout.write(self.style.SUCCESS('No import jobs waiting'))
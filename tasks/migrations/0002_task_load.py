@@ -0,0 +1,36 @@
+# Generated by Django 4.1.1 on 2026-10-18 17:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_task_loads(apps, schema_editor):
+    """
+    Creates loads of existing open tasks
+    """
+    task_model = apps.get_model('tasks', 'Task')
+    task_load_model = apps.get_model('tasks', 'TaskLoad')
+    task_load_model.objects.bulk_create(
+        task_load_model(task_id=task.pk, start=task.start, deadline=task.deadline,
+            hours=task.estimated_duration - task.actual_duration)
+        for task in task_model.objects.exclude(status='C'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskLoad',
+            fields=[
+                ('task', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='load', serialize=False, to='tasks.task')),
+                ('start', models.DateField()),
+                ('deadline', models.DateField(db_index=True)),
+                ('hours', models.IntegerField()),
+            ],
+        ),
+        migrations.RunPython(fill_task_loads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Full text index of tasks, only created on SQLite
+
+from django.db import migrations
+
+CREATE_SQL = [
+    "CREATE VIRTUAL TABLE tasks_task_fts USING fts5(description, category, tokenize='trigram')",
+    """CREATE TRIGGER tasks_task_fts_insert AFTER INSERT ON tasks_task BEGIN
+        INSERT INTO tasks_task_fts(rowid, description, category) VALUES (new.id, new.description,
+            (SELECT name FROM tasks_category WHERE id = new.category_id));
+    END""",
+    """CREATE TRIGGER tasks_task_fts_update AFTER UPDATE OF description, category_id
+            ON tasks_task BEGIN
+        UPDATE tasks_task_fts SET description = new.description,
+            category = (SELECT name FROM tasks_category WHERE id = new.category_id)
+            WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER tasks_task_fts_delete AFTER DELETE ON tasks_task BEGIN
+        DELETE FROM tasks_task_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER tasks_category_fts_update AFTER UPDATE OF name ON tasks_category BEGIN
+        UPDATE tasks_task_fts SET category = new.name
+            WHERE rowid IN (SELECT id FROM tasks_task WHERE category_id = new.id);
+    END""",
+    """INSERT INTO tasks_task_fts(rowid, description, category)
+        SELECT tasks_task.id, tasks_task.description, tasks_category.name
+        FROM tasks_task JOIN tasks_category ON tasks_category.id = tasks_task.category_id""",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS tasks_category_fts_update",
+    "DROP TRIGGER IF EXISTS tasks_task_fts_delete",
+    "DROP TRIGGER IF EXISTS tasks_task_fts_update",
+    "DROP TRIGGER IF EXISTS tasks_task_fts_insert",
+    "DROP TABLE IF EXISTS tasks_task_fts",
+]
+
+
+def create_index(apps, schema_editor):
+    """
+    Creates full text index on SQLite
+    """
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in CREATE_SQL:
+            schema_editor.execute(statement)
+
+
+def drop_index(apps, schema_editor):
+    """
+    Drops full text index on SQLite
+    """
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in DROP_SQL:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_data_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
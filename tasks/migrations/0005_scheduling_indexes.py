@@ -0,0 +1,34 @@
+# Generated by Django 4.1.1 on 2026-10-18 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_task_search'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='taskload',
+            name='deadline',
+            field=models.DateField(),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['-status', 'deadline', 'id'], name='task_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('status', 'C'), _negated=True), fields=['deadline', 'id'], name='task_open_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['start', '-deadline'], name='task_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskload',
+            index=models.Index(fields=['deadline', 'task'], name='task_load_deadline_idx'),
+        ),
+    ]
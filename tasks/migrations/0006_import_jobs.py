@@ -0,0 +1,43 @@
+# Generated by Django 4.1.1 on 2026-10-18 17:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0005_scheduling_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='imports/')),
+                ('name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('P', 'Waiting'), ('R', 'Importing'), ('D', 'Done'), ('F', 'Failed')], default='P', max_length=1)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('accepted', models.PositiveIntegerField(default=0)),
+                ('error', models.CharField(blank=True, max_length=255)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ImportRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('description', models.CharField(max_length=200)),
+                ('accepted', models.BooleanField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='tasks.importjob')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='importrow',
+            index=models.Index(fields=['job', 'accepted', 'number'], name='import_row_job_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 4.1.1 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+def actions_of_rows(apps, schema_editor):
+    """
+    Marks rows accepted before import modes as added
+    """
+    ImportRow = apps.get_model('tasks', 'ImportRow')
+    ImportRow.objects.filter(accepted=True).update(action='A')
+
+
+def accepted_of_rows(apps, schema_editor):
+    """
+    Marks rows that were not rejected as accepted
+    """
+    ImportRow = apps.get_model('tasks', 'ImportRow')
+    ImportRow.objects.exclude(action='R').update(accepted=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_import_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='external_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='mode',
+            field=models.CharField(choices=[('A', 'Add every row'), ('U', 'Add new and update changed tasks'), ('S', 'Update and remove tasks not in file')], default='A', max_length=1),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='updated',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='unchanged',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='deleted',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importrow',
+            name='action',
+            field=models.CharField(choices=[('A', 'Added'), ('U', 'Updated'), ('S', 'Unchanged'), ('R', 'Rejected')], default='R', max_length=1),
+            preserve_default=False,
+        ),
+        migrations.RunPython(actions_of_rows, accepted_of_rows),
+        migrations.RemoveIndex(
+            model_name='importrow',
+            name='import_row_job_idx',
+        ),
+        migrations.AlterField(
+            model_name='importrow',
+            name='accepted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RemoveField(
+            model_name='importrow',
+            name='accepted',
+        ),
+        migrations.AddIndex(
+            model_name='importrow',
+            index=models.Index(fields=['job', 'action', 'number'], name='import_row_job_idx'),
+        ),
+    ]
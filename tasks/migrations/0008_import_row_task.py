@@ -0,0 +1,24 @@
+# Generated by Django 4.1.1 on 2026-10-18 19:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_import_upsert'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importrow',
+            name='task',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_rows', to='tasks.task'),
+        ),
+        migrations.AlterField(
+            model_name='importjob',
+            name='mode',
+            field=models.CharField(choices=[('A', 'Add every row'), ('U', 'Add new and update changed tasks'), ('S', 'Update and remove imported tasks not in file')], default='A', max_length=1),
+        ),
+    ]
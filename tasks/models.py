@@ -2,10 +2,16 @@
 Models for Task Scheduler
 """
 
-from datetime import timedelta, date
-from django.db import models
+import time
+from datetime import date
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.core.exceptions import ValidationError
+from .scheduler import Calendar, DayRange, Schedule
 
 
 class Category(models.Model):
@@ -41,6 +47,31 @@ class Task(models.Model):
 
     duration_verbose = "Actual duration" if status == "C" else "Elapsed time"
     actual_duration = models.IntegerField(duration_verbose, default=0)
+    # Id of task in the system it is imported from
+    external_id = models.CharField(max_length=100, blank=True, null=True, db_index=True)
+
+    class Meta:
+        """
+        Task meta class
+        """
+        indexes = [
+            # Task list order
+            models.Index(fields=['-status', 'deadline', 'id'], name='task_list_idx'),
+            # Open tasks by deadline, for scheduling
+            models.Index(fields=['deadline', 'id'], condition=~models.Q(status='C'),
+                name='task_open_deadline_idx'),
+            # Timeline windows
+            models.Index(fields=['start', '-deadline'], name='task_timeline_idx'),
+        ]
+
+    def get_day_range(self):
+        """
+        Creates range of day ordinals
+        First day is start of task or current day
+        if start is prior to current day.
+        Last day is task deadline
+        """
+        return DayRange.of_task(self)
 
     def get_date_range(self):
         """
@@ -49,51 +80,60 @@ class Task(models.Model):
         if start is prior to current day.
         Last day is task deadline
         """
-        start = self.start if self.start > date.today() else date.today()
-        delta = self.deadline - start  # as timedelta
-        days = [start + timedelta(days=i) for i in range(delta.days + 1)]
-        return days
+        return list(self.get_day_range().dates())
 
     def is_in_range(self, date_range):
         """
-        Check is task is scheduled in provided date range
+        Check is task is scheduled in provided day range
+        or array of date objects
         """
-        self_range = self.get_date_range()
-        for day in date_range:
-            if day in self_range:
-                return True
-        return False
+        if not isinstance(date_range, DayRange):
+            date_range = DayRange(min(date_range).toordinal(), max(date_range).toordinal()) \
+                if date_range else DayRange(1, 0)
+        return self.get_day_range().overlaps(date_range)
 
     def get_new_deadline(self, tasks=None):
         """
-        Finds new possible deadline for task
+        Finds new possible deadline for task,
+        None if there is no possible deadline
         """
-        while not self.enough_time(tasks):
-            self.deadline = self.deadline + timedelta(days = 1)
-        return self.deadline
+        deadline = self.get_schedule(tasks).earliest_deadline(self)
+        if deadline is not None:
+            self.deadline = deadline
+        return deadline
 
-    def get_new_start_date(self):
+    def get_new_start_date(self, tasks=None):
         """
-        Find gap where ?
+        Finds latest possible start date before deadline,
+        None if there is no possible start date
         """
-        self.start = self.deadline
-        while not self.enough_time():
-            self.start = self.start - timedelta(days = 1)
-        return self.start
+        start = self.get_schedule(tasks).latest_start(self)
+        if start is not None:
+            self.start = start
+        return start
 
     def avalible_hours(self, date_range=None):
         """
         Gets avalible hours based on user availability
         during current tasks date range
         """
+        calendar = Availability.get_cached().get_calendar()
         if date_range is None:
-            date_range = self.get_date_range()
-        availability = Availability.objects.get(id=1).as_list()
-        hours = 0
-        for day in date_range:
-            hours += availability[day.weekday()]
-        return hours
+            date_range = self.get_day_range()
+        if isinstance(date_range, DayRange):
+            return calendar.hours(date_range.first, date_range.last)
+        return sum(calendar.hours(day.toordinal(), day.toordinal()) for day in date_range)
 
+    def get_schedule(self, all_tasks=None):
+        """
+        Creates scheduling snapshot of all other open tasks
+        ordered by deadline, or of the provided tasks
+        """
+        if isinstance(all_tasks, Schedule):
+            return all_tasks
+        if all_tasks is not None:
+            return Schedule(all_tasks, Availability.get_cached())
+        return TaskLoad.get_schedule(exclude=[self.id] if self.id else [])
 
     def enough_time(self, all_tasks=None):
         """
@@ -102,20 +142,7 @@ class Task(models.Model):
         """
         if self.status == "C":
             return True
-        hours_left = self.estimated_duration - self.actual_duration
-        if self.avalible_hours() - hours_left < 0:
-            return False
-        if all_tasks is None:
-            all_tasks = __class__.objects.exclude(id=self.id).order_by('deadline')
-        self_range = self.get_date_range()
-        for task in all_tasks:
-            if task.is_in_range(self_range) and task.status != 'C':
-                task_range = task.get_date_range()
-                self_range.extend(x for x in task_range if x not in self_range)
-                hours_left += (task.estimated_duration - task.actual_duration)
-                if (self.avalible_hours(self_range) - hours_left) < 0:
-                    return False
-        return True
+        return self.get_schedule(all_tasks).enough_time(self)
 
     def clean(self) -> None:
         """
@@ -127,17 +154,83 @@ class Task(models.Model):
 
         # Ensure there is enough avalible time to schedule new task
         if self.pk is None:
-            if not self.enough_time():
+            schedule = self.get_schedule()
+            if not schedule.enough_time(self):
+                deadline = self.get_new_deadline(schedule)
+                start = self.get_new_start_date(schedule)
                 raise ValidationError({'deadline': \
-                    (f'Next possible deadline: {self.get_new_deadline()}.'),
-                        'start': (f'Possible start date: {self.get_new_start_date()}')})
+                    (f'Next possible deadline: {deadline}.' if deadline else
+                        'No possible deadline with current availability.'),
+                        'start': (f'Possible start date: {start}' if start else
+                            'No possible start date before deadline.')})
         return super().clean()
 
+    def save(self, *args, **kwargs):
+        """
+        Saves task and its committed hours in one transaction
+        """
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            TaskLoad.sync(self)
+
     def __str__(self) -> str:
         return self.description
 
     def __len__(self):
-        return len(self.get_date_range())
+        return len(self.get_day_range())
+
+
+class TaskLoad(models.Model):
+    """
+    Committed hours of an open task, kept in step with Task
+    so scheduling reads only open tasks
+    """
+    task = models.OneToOneField(Task, on_delete=models.CASCADE,
+        primary_key=True, related_name='load')
+    start = models.DateField()
+    deadline = models.DateField()
+    hours = models.IntegerField()
+
+    class Meta:
+        """
+        Task load meta class
+        """
+        indexes = [
+            models.Index(fields=['deadline', 'task'], name='task_load_deadline_idx'),
+        ]
+
+    @classmethod
+    def of_task(cls, task):
+        """
+        Creates unsaved load of task
+        """
+        return cls(task_id=task.pk, start=task.start, deadline=task.deadline,
+            hours=task.estimated_duration - task.actual_duration)
+
+    @classmethod
+    def get_schedule(cls, exclude=()):
+        """
+        Creates scheduling snapshot of open tasks ordered
+        by deadline, leaving out tasks with ids in exclude
+        """
+        schedule = Schedule([], Availability.get_cached())
+        loads = cls.objects.exclude(task_id__in=exclude).filter(
+            deadline__gte=date.today()).order_by('deadline', 'task_id')
+        for start, deadline, hours in loads.values_list('start', 'deadline', 'hours'):
+            schedule.add(start, deadline, hours)
+        return schedule
+
+    @classmethod
+    def sync(cls, task):
+        """
+        Updates load of task, removes it once task is completed
+        """
+        if task.status == Task.completed:
+            cls.objects.filter(task_id=task.pk).delete()
+            return
+        load = cls.of_task(task)
+        cls.objects.update_or_create(task_id=task.pk, defaults={
+            'start': load.start, 'deadline': load.deadline, 'hours': load.hours})
 
 
 
@@ -145,6 +238,9 @@ class Availability(models.Model):
     """
     Availability model class
     """
+    cache_key = 'tasks:availability'
+    _cached = None
+
     monday = models.PositiveIntegerField(
         "Monday", validators=[MaxValueValidator(24), MinValueValidator(0)])
     tuesday = models.PositiveIntegerField(
@@ -181,9 +277,195 @@ class Availability(models.Model):
         """
         return sum(self.as_list())
 
+    @classmethod
+    def get_cached(cls):
+        """
+        Gets availability singleton, kept in the cache named by
+        TASKS_AVAILABILITY_CACHE until it changes. Without that cache it is
+        kept in process along with the data version it was read at. The
+        version is checked at most once every TASKS_AVAILABILITY_TTL
+        seconds and availability read again once any process has bumped it.
+        """
+        alias = getattr(settings, 'TASKS_AVAILABILITY_CACHE', None)
+        if alias is not None:
+            availability = caches[alias].get(cls.cache_key)
+            if availability is None:
+                availability = cls.objects.get(id=1)
+                caches[alias].set(cls.cache_key, availability, None)
+            return availability
+        now = time.monotonic()
+        ttl = getattr(settings, 'TASKS_AVAILABILITY_TTL', 5)
+        if cls._cached is not None and now - cls._cached[0] < ttl:
+            return cls._cached[2]
+        version = DataVersion.objects.filter(pk=1).values_list('version', flat=True).first()
+        if cls._cached is None or cls._cached[1] != version:
+            cls._cached = (now, version, cls.objects.get(id=1))
+        else:
+            cls._cached = (now, version, cls._cached[2])
+        return cls._cached[2]
+
+    @classmethod
+    def clear_cache(cls):
+        """
+        Clears cached availability
+        """
+        cls._cached = None
+        alias = getattr(settings, 'TASKS_AVAILABILITY_CACHE', None)
+        if alias is not None:
+            caches[alias].delete(cls.cache_key)
+
+    def get_calendar(self):
+        """
+        Returns calendar of cumulative avalible hours
+        """
+        return Calendar(self.as_list())
+
     def save(self, *args, **kwargs):
         """
         Set pk to 1 to ensure singleton table
         """
         self.pk = 1
         super().save(*args, **kwargs)
+
+
+class DataVersion(models.Model):
+    """
+    Counter bumped on every change to tasks,
+    categories or availability
+    """
+    version = models.PositiveIntegerField(default=0)
+    changed = models.DateTimeField(default=timezone.now)
+
+    @classmethod
+    def get(cls):
+        """
+        Gets current data version
+        """
+        return cls.objects.get_or_create(pk=1)[0]
+
+    @classmethod
+    def bump(cls):
+        """
+        Marks data as changed
+        """
+        if not cls.objects.filter(pk=1).update(version=F('version') + 1,
+                changed=timezone.now()):
+            cls.objects.get_or_create(pk=1, defaults={'version': 1})
+
+    def key(self):
+        """
+        Returns key that changes with every data change
+        """
+        return f'{self.version}.{self.changed.timestamp()}'
+
+
+class ImportJob(models.Model):
+    """
+    Uploaded file of tasks, imported off the request
+    by the import worker
+    """
+    pending = "P"
+    running = "R"
+    done = "D"
+    failed = "F"
+    STATUS = (
+        (pending, "Waiting"),
+        (running, "Importing"),
+        (done, "Done"),
+        (failed, "Failed")
+    )
+    add = "A"
+    update = "U"
+    sync = "S"
+    MODES = (
+        (add, "Add every row"),
+        (update, "Add new and update changed tasks"),
+        (sync, "Update and remove imported tasks not in file")
+    )
+
+    file = models.FileField(upload_to='imports/')
+    mode = models.CharField(max_length=1, choices=MODES, default=add)
+    name = models.CharField(max_length=255)
+    status = models.CharField(max_length=1, choices=STATUS, default=pending)
+    created = models.DateTimeField(default=timezone.now)
+    finished = models.DateTimeField(null=True, blank=True)
+    processed = models.PositiveIntegerField(default=0)
+    accepted = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    unchanged = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    error = models.CharField(max_length=255, blank=True)
+
+    @classmethod
+    def claim(cls):
+        """
+        Marks oldest waiting job as importing and returns it,
+        None if no job is waiting
+        """
+        while True:
+            job = cls.objects.filter(status=cls.pending).order_by('created', 'id').first()
+            if job is None:
+                return None
+            # Another worker may claim the same job first
+            if cls.objects.filter(pk=job.pk, status=cls.pending).update(status=cls.running):
+                job.status = cls.running
+                return job
+
+    def progress(self, rejected_shown=100):
+        """
+        Returns progress of job with the first rejected rows
+        """
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.get_status_display(),
+            'finished': self.status in (self.done, self.failed),
+            'processed': self.processed,
+            'accepted': self.accepted,
+            'added': self.accepted - self.updated - self.unchanged,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'deleted': self.deleted,
+            'rejected': self.processed - self.accepted,
+            'error': self.error,
+            'rejected_rows': [
+                {'row': number, 'description': description}
+                for number, description in self.rows.filter(action=ImportRow.rejected)
+                    .order_by('number').values_list('number', 'description')[:rejected_shown]
+            ],
+        }
+
+    def __str__(self):
+        return self.name
+
+
+class ImportRow(models.Model):
+    """
+    Result of one row of an import job
+    """
+    added = "A"
+    updated = "U"
+    unchanged = "S"
+    rejected = "R"
+    ACTIONS = (
+        (added, "Added"),
+        (updated, "Updated"),
+        (unchanged, "Unchanged"),
+        (rejected, "Rejected")
+    )
+
+    job = models.ForeignKey(ImportJob, on_delete=models.CASCADE, related_name='rows')
+    number = models.PositiveIntegerField()
+    description = models.CharField(max_length=200)
+    action = models.CharField(max_length=1, choices=ACTIONS)
+    # Task added, updated or matched by row
+    task = models.ForeignKey(Task, on_delete=models.SET_NULL, null=True,
+        related_name='import_rows')
+
+    class Meta:
+        """
+        Import row meta class
+        """
+        indexes = [
+            models.Index(fields=['job', 'action', 'number'], name='import_row_job_idx'),
+        ]
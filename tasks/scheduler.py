@@ -0,0 +1,824 @@
+"""
+Scheduling engine for Task Scheduler
+"""
+
+import bisect
+import heapq
+from datetime import date
+
+# Last day ordinal a date can hold
+MAX_ORDINAL = date.max.toordinal()
+
+# Days from today a plan keeps the hours per day for
+PLAN_DAYS = 3660
+
+
+class DayRange:
+    """
+    Inclusive range of day ordinals, empty when first > last
+    """
+    __slots__ = ('first', 'last')
+
+    def __init__(self, first, last):
+        self.first = first
+        self.last = last
+
+    @classmethod
+    def of_task(cls, task, today=None):
+        """
+        Creates range of task, first day is task start
+        or today if start is prior to today
+        """
+        today = today if today is not None else date.today().toordinal()
+        return cls(max(task.start.toordinal(), today), task.deadline.toordinal())
+
+    def __len__(self):
+        return max(self.last - self.first + 1, 0)
+
+    def __bool__(self):
+        return self.first <= self.last
+
+    def __eq__(self, other):
+        if not isinstance(other, DayRange):
+            return NotImplemented
+        return (self.first, self.last) == (other.first, other.last) or not (self or other)
+
+    def __repr__(self):
+        return f'DayRange({self.first}, {self.last})'
+
+    def overlaps(self, other):
+        """
+        Checks if ranges have any day in common
+        """
+        return bool(self) and bool(other) \
+            and self.first <= other.last and other.first <= self.last
+
+    def __and__(self, other):
+        """
+        Days in both ranges
+        """
+        return DayRange(max(self.first, other.first), min(self.last, other.last))
+
+    def __or__(self, other):
+        """
+        Smallest range covering both ranges, which is
+        their union when they overlap
+        """
+        if not self:
+            return other
+        if not other:
+            return self
+        return DayRange(min(self.first, other.first), max(self.last, other.last))
+
+    def dates(self):
+        """
+        Yields every day in range as date object
+        """
+        for ordinal in range(self.first, self.last + 1):
+            yield date.fromordinal(ordinal)
+
+
+class Calendar:
+    """
+    Cumulative avalible hours by day ordinal.
+    Day ordinal 1 is a monday, so the week repeats every
+    seven ordinals and any range is answered in constant time.
+    """
+
+    def __init__(self, weekly):
+        self.weekly = list(weekly)
+        self.prefix = [0]
+        for hours in self.weekly:
+            self.prefix.append(self.prefix[-1] + hours)
+        self.per_week = self.prefix[-1]
+
+    def cumulative(self, ordinal):
+        """
+        Avalible hours from day ordinal 1 up to and including ordinal
+        """
+        weeks, rest = divmod(ordinal, 7)
+        return weeks * self.per_week + self.prefix[rest]
+
+    def hours(self, first, last):
+        """
+        Avalible hours between first and last day ordinal, inclusive
+        """
+        if last < first:
+            return 0
+        return self.cumulative(last) - self.cumulative(first - 1)
+
+    def earliest_end(self, first, hours):
+        """
+        Earliest day ordinal by which hours are avalible
+        starting on first, None if that never happens
+        """
+        if hours <= 0:
+            return first - 1
+        if self.per_week <= 0:
+            return None
+        target = self.cumulative(first - 1) + hours
+        last = max(first - 1, 7 * (target // self.per_week - 1))
+        while self.cumulative(last) < target:
+            last += 1
+        return last
+
+    def latest_start(self, last, hours):
+        """
+        Latest day ordinal from which hours are avalible
+        up to last, None if that never happens
+        """
+        if hours <= 0:
+            return last + 1
+        if self.per_week <= 0:
+            return None
+        target = self.cumulative(last) - hours
+        if target < 0:
+            return None
+        before = min(last, 7 * (target // self.per_week + 2))
+        while self.cumulative(before) > target:
+            before -= 1
+        return before + 1
+
+
+class HourSums:
+    """
+    Running sums of hours by position, Fenwick tree
+    """
+
+    def __init__(self, size):
+        self.sums = [0] * (size + 1)
+
+    def add(self, index, hours):
+        """
+        Adds hours at position index
+        """
+        index += 1
+        while index < len(self.sums):
+            self.sums[index] += hours
+            index += index & -index
+
+    def total(self, index):
+        """
+        Sum of hours at positions up to and including index
+        """
+        index += 1
+        total = 0
+        while index > 0:
+            total += self.sums[index]
+            index -= index & -index
+        return total
+
+
+class SparseTable:
+    """
+    Static table answering min or max of any range
+    of values in constant time
+    """
+
+    def __init__(self, values, function):
+        self.function = function
+        self.levels = [list(values)]
+        width = 1
+        while 2 * width <= len(values):
+            level = self.levels[-1]
+            self.levels.append([function(level[index], level[index + width])
+                for index in range(len(level) - width)])
+            width *= 2
+
+    def get(self, first, last):
+        """
+        Function of values from position first up to and including last
+        """
+        level = (last - first + 1).bit_length() - 1
+        values = self.levels[level]
+        return self.function(values[first], values[last - (1 << level) + 1])
+
+
+class SlackTree:
+    """
+    Segment tree of checks by position holding hours needed, counted as
+    cumulative hours of the calendar, and how many of those are past the
+    last day of the check. Positions without a check hold minus infinity.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.needed = [float('-inf')] * (4 * max(size, 1))
+        self.over = [float('-inf')] * (4 * max(size, 1))
+        self.pending = [0] * (4 * max(size, 1))
+
+    def push(self, node):
+        """
+        Passes hours pending on node on to its children
+        """
+        if self.pending[node]:
+            for child in (2 * node, 2 * node + 1):
+                self.needed[child] += self.pending[node]
+                self.over[child] += self.pending[node]
+                self.pending[child] += self.pending[node]
+            self.pending[node] = 0
+
+    def pull(self, node):
+        """
+        Updates node from its children
+        """
+        self.needed[node] = max(self.needed[2 * node], self.needed[2 * node + 1])
+        self.over[node] = max(self.over[2 * node], self.over[2 * node + 1])
+
+    def set(self, index, needed, over, node=1, low=0, high=None):
+        """
+        Sets check at position index
+        """
+        high = self.size - 1 if high is None else high
+        if low == high:
+            self.needed[node] = needed
+            self.over[node] = over
+            return
+        self.push(node)
+        middle = (low + high) // 2
+        if index <= middle:
+            self.set(index, needed, over, 2 * node, low, middle)
+        else:
+            self.set(index, needed, over, 2 * node + 1, middle + 1, high)
+        self.pull(node)
+
+    def add(self, first, hours, node=1, low=0, high=None):
+        """
+        Adds hours to checks at position first and after
+        """
+        high = self.size - 1 if high is None else high
+        if high < first:
+            return
+        if first <= low:
+            self.needed[node] += hours
+            self.over[node] += hours
+            self.pending[node] += hours
+            return
+        self.push(node)
+        middle = (low + high) // 2
+        self.add(first, hours, 2 * node, low, middle)
+        self.add(first, hours, 2 * node + 1, middle + 1, high)
+        self.pull(node)
+
+    def most(self, end, node=1, low=0, high=None):
+        """
+        Most hours needed by checks at positions before end
+        """
+        high = self.size - 1 if high is None else high
+        if end <= low:
+            return float('-inf')
+        if high < end:
+            return self.needed[node]
+        self.push(node)
+        middle = (low + high) // 2
+        return max(self.most(end, 2 * node, low, middle),
+            self.most(end, 2 * node + 1, middle + 1, high))
+
+    def get(self, index, node=1, low=0, high=None):
+        """
+        Hours needed by check at position index
+        """
+        high = self.size - 1 if high is None else high
+        if low == high:
+            return self.needed[node]
+        self.push(node)
+        middle = (low + high) // 2
+        if index <= middle:
+            return self.get(index, 2 * node, low, middle)
+        return self.get(index, 2 * node + 1, middle + 1, high)
+
+    def first_over(self, first, node=1, low=0, high=None):
+        """
+        First position from first on with a check needing
+        hours past its last day, None if there is none
+        """
+        high = self.size - 1 if high is None else high
+        if high < first or self.over[node] <= 0:
+            return None
+        if low == high:
+            return low
+        self.push(node)
+        middle = (low + high) // 2
+        found = self.first_over(first, 2 * node, low, middle)
+        if found is None:
+            found = self.first_over(first, 2 * node + 1, middle + 1, high)
+        return found
+
+
+class Schedule:
+    """
+    In-memory snapshot of open tasks and weekly availability.
+    Dates are handled as day ordinals so overlap and union
+    checks are constant time.
+    """
+
+    def __init__(self, tasks, availability, today=None):
+        """
+        Tasks are kept in the order given, which is
+        the order feasibility checks walk them in
+        """
+        self.today = (today or date.today()).toordinal()
+        self.calendar = availability.get_calendar()
+        self.hours = self.calendar.hours
+        self.tasks = []
+        for task in tasks:
+            if task.status != "C":
+                self.add(task.start, task.deadline,
+                    task.estimated_duration - task.actual_duration)
+
+    def add(self, start, deadline, hours):
+        """
+        Adds open task to end of snapshot
+        """
+        day_range = DayRange(max(start.toordinal(), self.today), deadline.toordinal())
+        # Tasks with nothing left of their date range never overlap
+        if day_range:
+            self.tasks.append((day_range.first, day_range.last, hours))
+
+    def insert(self, start, deadline, hours):
+        """
+        Adds open task to snapshot ordered by deadline,
+        after tasks with the same deadline
+        """
+        day_range = DayRange(max(start.toordinal(), self.today), deadline.toordinal())
+        if day_range:
+            bisect.insort(self.tasks, (day_range.first, day_range.last, hours),
+                key=lambda item: item[1])
+
+    def remove(self, start, deadline, hours):
+        """
+        Removes open task from snapshot if it is in it
+        """
+        day_range = DayRange(max(start.toordinal(), self.today), deadline.toordinal())
+        item = (day_range.first, day_range.last, hours)
+        if item in self.tasks:
+            self.tasks.remove(item)
+
+    def span(self, task):
+        """
+        Returns (first day, last day, hours left) of task,
+        first day is never prior to today
+        """
+        day_range = DayRange.of_task(task, self.today)
+        return day_range.first, day_range.last, task.estimated_duration - task.actual_duration
+
+    def checks(self, first, last, hours):
+        """
+        Yields (first, last, hours) of the growing union of a task
+        and every open task overlapping it, in snapshot order
+        """
+        yield first, last, hours
+        if first > last:
+            return
+        for start, end, left in self.tasks:
+            if start <= last and end >= first:
+                first = min(first, start)
+                last = max(last, end)
+                hours += left
+                yield first, last, hours
+
+    def enough_time(self, task):
+        """
+        Checks if there is enough avalible time to schedule task
+        @return: bool
+        """
+        if task.status == "C":
+            return True
+        return all(self.hours(first, last) >= hours
+            for first, last, hours in self.checks(*self.span(task)))
+
+    def earliest_deadline(self, task):
+        """
+        Finds earliest deadline, not prior to the current one,
+        with enough avalible time to schedule task.
+        Returns None if there is no such deadline, or it is after date.max.
+        """
+        if task.status == "C":
+            return task.deadline
+        first, last, hours = self.span(task)
+        if first > last or self.calendar.per_week <= 0 or any(
+                before[1] > after[1] for before, after in zip(self.tasks, self.tasks[1:])):
+            deadline = self.earliest_deadline_by_segments(first, last, hours)
+        else:
+            deadline = self.earliest_deadline_by_joins(first, last, hours)
+        if deadline is None or deadline > MAX_ORDINAL:
+            return None
+        return date.fromordinal(deadline)
+
+    def earliest_deadline_by_segments(self, first, last, hours):
+        """
+        Earliest deadline ordinal of task span walking every check
+        again for each range of deadlines pulling in the same tasks
+        """
+        # Which tasks a deadline pulls in only changes on task start days,
+        # between those the checks only get easier as the deadline moves
+        bounds = sorted({start for start, _, _ in self.tasks if start > last}
+            | ({first} if first > last else set()))
+        for low, high in zip([last] + bounds, [bound - 1 for bound in bounds] + [None]):
+            deadline = low
+            for lo, hi, needed in self.checks(first, low, hours):
+                if self.hours(lo, hi) < needed:
+                    end = self.calendar.earliest_end(lo, needed)
+                    deadline = None if end is None else max(deadline, end)
+                    if deadline is None:
+                        break
+            if deadline is not None and (high is None or deadline <= high):
+                return deadline
+        return None
+
+    def earliest_deadline_by_joins(self, first, last, hours):
+        """
+        Earliest deadline ordinal of task span for a snapshot ordered by
+        deadline, with first <= last and availability every week.
+        In deadline order the union only ever starts earlier than first
+        through tasks starting before it, so the first day of each check
+        is the same for every deadline. Moving the deadline only adds
+        tasks to the union, each is added once and its hours carried
+        forward to the checks after it.
+        """
+        cumulative = self.calendar.cumulative
+        # Tasks due before first are never part of the union
+        tasks = [item for item in self.tasks if item[1] >= first]
+        ends = [end for _, end, _ in tasks]
+        # Cumulative hours before the first day of the check of each task
+        before = []
+        lowest = first
+        for start, _, _ in tasks:
+            lowest = min(lowest, start)
+            before.append(cumulative(lowest - 1))
+        # Day from which each task is in the union, its start or the day
+        # an earlier task reaching its start is. The stack holds the
+        # lowest join day of every suffix of the tasks so far.
+        joins = []
+        stack = []
+        for start, end, _ in tasks:
+            index = bisect.bisect_left(stack, bisect.bisect_left(ends, start),
+                key=lambda item: item[0])
+            joins.append(min(start, stack[index][1]) if index < len(stack) else start)
+            while stack and stack[-1][1] >= joins[-1]:
+                stack.pop()
+            stack.append((len(joins) - 1, joins[-1]))
+        order = sorted(range(len(tasks)), key=joins.__getitem__)
+        # Hours of the union so far and cumulative hours needed by each check
+        joined = HourSums(len(tasks))
+        needed = SlackTree(len(tasks))
+        # Added hours only make checks harder, so a deadline ruled out
+        # stays ruled out for every later range of deadlines
+        growing = all(left >= 0 for _, _, left in tasks)
+        lowest = max(last, self.calendar.earliest_end(first, hours))
+        deadline = lowest
+        position = 0
+        low = last
+        while True:
+            while position < len(order) and joins[order[position]] <= low:
+                index = order[position]
+                start, end, left = tasks[index]
+                joined.add(index, left)
+                total = before[index] + hours + joined.total(index)
+                needed.add(index + 1, left)
+                needed.set(index, total, total - cumulative(end))
+                position += 1
+            high = joins[order[position]] - 1 if position < len(order) else None
+            deadline = max(deadline if growing else lowest, low)
+            while high is None or deadline <= high:
+                # Checks of tasks due before the deadline end on it,
+                # the others end on their own deadline
+                split = bisect.bisect_left(ends, deadline)
+                most = needed.most(split)
+                if most > cumulative(deadline):
+                    deadline = self.calendar.earliest_end(1, most)
+                    continue
+                over = needed.first_over(split)
+                if over is None:
+                    return deadline
+                deadline = self.calendar.earliest_end(1, needed.get(over))
+            low = high + 1
+
+    def latest_start(self, task):
+        """
+        Finds latest start date, not after the deadline,
+        with enough avalible time to schedule task.
+        Returns None if there is no such start date.
+        """
+        if task.status == "C":
+            return task.deadline
+        last = task.deadline.toordinal()
+        hours = task.estimated_duration - task.actual_duration
+        if last < self.today:
+            return task.deadline if hours <= 0 else None
+        if self.calendar.per_week <= 0 or any(
+                before[1] > after[1] for before, after in zip(self.tasks, self.tasks[1:])):
+            start = self.latest_start_by_segments(last, hours)
+        else:
+            start = self.latest_start_by_tables(last, hours)
+        if start is None or start < 1:
+            return None
+        return date.fromordinal(start)
+
+    def latest_start_by_segments(self, last, hours):
+        """
+        Latest start ordinal of task walking every check again
+        for each range of start dates pulling in the same tasks
+        """
+        # Which tasks a start date pulls in only changes on task deadlines,
+        # no start prior to today is better than today itself
+        bounds = sorted({end for _, end, _ in self.tasks if self.today <= end < last},
+            reverse=True)
+        for high, low in zip([last] + bounds, [bound + 1 for bound in bounds] + [self.today]):
+            start = high
+            for lo, hi, needed in self.checks(high, last, hours):
+                if self.hours(lo, hi) < needed:
+                    begin = self.calendar.latest_start(hi, needed)
+                    start = None if begin is None else min(start, begin)
+                    if start is None:
+                        break
+            if start is not None and start >= low:
+                return start
+        return None
+
+    def latest_start_by_tables(self, last, hours):
+        """
+        Latest start ordinal of task for a snapshot ordered by deadline,
+        with availability every week. In deadline order only tasks due
+        from the start date on are part of the union. Those due before
+        the deadline always are, and which of those due later are does not
+        depend on the start date, so each range of start dates is checked
+        with prefix sums and range tables instead of walking the tasks.
+        """
+        cumulative = self.calendar.cumulative
+        split = bisect.bisect_left(self.tasks, last, key=lambda item: item[1])
+        # Tasks due before the deadline, in the union from their deadline back
+        starts = [start for start, _, _ in self.tasks[:split]]
+        ends = [end for _, end, _ in self.tasks[:split]]
+        sums = [0]
+        for _, _, left in self.tasks[:split]:
+            sums.append(sums[-1] + left)
+        lowest = SparseTable(starts, min)
+        most = SparseTable(sums[1:], max)
+        below = [float('inf')] * (split + 1)
+        for index in range(split - 1, -1, -1):
+            below[index] = min(below[index + 1], starts[index])
+        # Most of first day cumulative hours plus hours of the checks from
+        # index on, once the union starts no later than the start at index
+        following = [split] * split
+        worst = [float('-inf')] * (split + 1)
+        stack = []
+        for index in range(split - 1, -1, -1):
+            while stack and starts[stack[-1]] >= starts[index]:
+                stack.pop()
+            following[index] = stack[-1] if stack else split
+            stack.append(index)
+            worst[index] = max(worst[following[index]], cumulative(starts[index] - 1)
+                + most.get(index, following[index] - 1))
+        # Tasks due from the deadline on reached by the union,
+        # hours past the last day of each check before its first day
+        later = []
+        reach = last
+        total = 0
+        first = float('inf')
+        for start, end, left in self.tasks[split:]:
+            if start <= reach:
+                reach = max(reach, end)
+                total += left
+                first = min(first, start)
+                later.append((-first, total - cumulative(end)))
+        firsts = [item[0] for item in later]
+        with_start = [float('-inf')]
+        for _, over in later:
+            with_start.append(max(with_start[-1], over))
+        without_start = [float('-inf')] * (len(later) + 1)
+        for index in range(len(later) - 1, -1, -1):
+            first, over = later[index]
+            without_start[index] = max(without_start[index + 1], cumulative(-first - 1) + over)
+
+        def fits(start, low):
+            """
+            Checks if task fits starting on start, which pulls
+            in the tasks due before the deadline from low on
+            """
+            if cumulative(start - 1) + hours > cumulative(last):
+                return False
+            if low < split:
+                # First task from low starting before start
+                end = low
+                if lowest.get(low, split - 1) < start:
+                    high = split - 1
+                    while end < high:
+                        middle = (end + high) // 2
+                        if lowest.get(low, middle) < start:
+                            high = middle
+                        else:
+                            end = middle + 1
+                else:
+                    end = split
+                limit = cumulative(last) - hours + sums[low]
+                if end > low and cumulative(start - 1) + most.get(low, end - 1) > limit:
+                    return False
+                if end < split and worst[end] > limit:
+                    return False
+            first = min(start, below[low])
+            count = bisect.bisect_right(firsts, -first)
+            over = max(cumulative(first - 1) + with_start[count], without_start[count])
+            return over + hours + sums[split] - sums[low] <= 0
+
+        bounds = sorted(set(end for end in ends if self.today <= end < last), reverse=True)
+        for high, low in zip([last] + bounds, [bound + 1 for bound in bounds] + [self.today]):
+            index = bisect.bisect_left(ends, low)
+            if not fits(low, index):
+                continue
+            # Within a range of start dates pulling in the same tasks
+            # every start before one that fits fits as well
+            while low < high:
+                middle = (low + high + 1) // 2
+                if fits(middle, index):
+                    low = middle
+                else:
+                    high = middle - 1
+            return low
+        return None
+
+
+def finish_hours(starts, hours, done=0):
+    """
+    Hands out avalible hours earliest deadline first to tasks given in
+    deadline order, by the cumulative hours before their start date and
+    their hours left. Returns cumulative hours by which each task is done,
+    counting from done. Only jumps between starts and finishes.
+    """
+    finish = [None for _ in starts]
+    remaining = list(hours)
+    releases = sorted(range(len(starts)), key=starts.__getitem__)
+    # Started tasks by index, which is their deadline order
+    started = []
+    position = 0
+    while position < len(releases) or started:
+        if not started:
+            done = max(done, starts[releases[position]])
+        while position < len(releases) and starts[releases[position]] <= done:
+            heapq.heappush(started, releases[position])
+            position += 1
+        index = started[0]
+        if position == len(releases) or done + remaining[index] <= starts[releases[position]]:
+            done += remaining[index]
+            finish[index] = done
+            heapq.heappop(started)
+        else:
+            remaining[index] -= starts[releases[position]] - done
+            done = starts[releases[position]]
+    return finish
+
+
+def overtime_deadlines(tasks, calendar, today=None):
+    """
+    Projects overtime deadlines of the earliest deadline first plan in one
+    pass over the start dates and finishes of open tasks, counted as
+    cumulative hours of the calendar so the days in between are skipped.
+    Yields (task, projected deadline) in deadline order for tasks that
+    would be done after their deadline, tasks that can not be projected
+    at all or only after date.max are left out.
+    """
+    today = (today or date.today()).toordinal()
+    open_tasks = sorted((task for task in tasks if task.status != "C"
+        and task.estimated_duration - task.actual_duration > 0),
+        key=lambda task: (task.deadline, task.pk or 0))
+    if calendar.per_week <= 0:
+        return
+    finish = finish_hours(
+        [calendar.cumulative(max(task.start.toordinal(), today) - 1) for task in open_tasks],
+        [task.estimated_duration - task.actual_duration for task in open_tasks],
+        calendar.cumulative(today - 1))
+    for task, done in zip(open_tasks, finish):
+        if calendar.cumulative(task.deadline.toordinal()) < done:
+            end = calendar.earliest_end(1, done)
+            if end <= MAX_ORDINAL:
+                yield task, date.fromordinal(end)
+
+
+def simulate(tasks, availability, scenarios, today=None):
+    """
+    Evaluates scenarios against one snapshot of open tasks, ordered by
+    deadline, without saving anything. A scenario is a pair of
+    hypothetical tasks and an availability to use instead, or None.
+    Each task is checked as if the tasks before it that fit were added.
+    Returns one dict of checked tasks and overtime per scenario.
+    """
+    results = []
+    for new_tasks, new_availability in scenarios:
+        current = new_availability or availability
+        schedule = Schedule(tasks, current, today)
+        checked = []
+        added = []
+        for task in new_tasks:
+            fits = schedule.enough_time(task)
+            checked.append({
+                'task': task,
+                'fits': fits,
+                'deadline': None if fits else schedule.earliest_deadline(task),
+                'start': None if fits else schedule.latest_start(task),
+            })
+            if fits and task.status != "C":
+                schedule.insert(task.start, task.deadline,
+                    task.estimated_duration - task.actual_duration)
+                added.append(task)
+        results.append({
+            'tasks': checked,
+            'overtime': list(overtime_deadlines(list(tasks) + added,
+                current.get_calendar(), today)),
+        })
+    return results
+
+
+class Plan:
+    """
+    Avalible hours given to open tasks day by day, earliest deadline
+    first. A task gets hours from its start date on and keeps
+    getting them after its deadline until it is done. Hours per
+    day are kept for PLAN_DAYS from today.
+    """
+
+    def __init__(self, tasks, calendar, today=None):
+        self.today = (today or date.today()).toordinal()
+        self.last = self.today + PLAN_DAYS - 1
+        self.tasks = [task for task in tasks if task.status != "C"
+            and task.estimated_duration - task.actual_duration > 0]
+        # Hours per day and finish day of each task, by index in self.tasks
+        self.days = [[] for _ in self.tasks]
+        self.finish = [None for _ in self.tasks]
+        if calendar.per_week > 0:
+            self.allocate(calendar)
+
+    def allocate(self, calendar):
+        """
+        Hands out hours of each day to the released task
+        with the earliest deadline. Whole days before the next start
+        date or finish go to one task at once, so long tasks do not
+        walk every day. Tasks not done by date.max never finish.
+        """
+        remaining = [task.estimated_duration - task.actual_duration for task in self.tasks]
+        first = [max(task.start.toordinal(), self.today) for task in self.tasks]
+        releases = sorted(range(len(self.tasks)), key=first.__getitem__)
+        released = []
+        position = 0
+        day = self.today
+        while (position < len(releases) or released) and day <= MAX_ORDINAL:
+            if not released:
+                day = max(day, first[releases[position]])
+            while position < len(releases) and first[releases[position]] <= day:
+                index = releases[position]
+                task = self.tasks[index]
+                heapq.heappush(released, (task.deadline, task.pk or 0, index))
+                position += 1
+            index = released[0][2]
+            stop = calendar.earliest_end(day, remaining[index])
+            if position < len(releases):
+                stop = min(stop, first[releases[position]])
+            if stop > day:
+                remaining[index] -= calendar.hours(day, stop - 1)
+                self.days[index].extend((each, calendar.hours(each, each))
+                    for each in range(day, min(stop - 1, self.last) + 1)
+                    if calendar.hours(each, each) > 0)
+                day = stop
+                continue
+            capacity = calendar.hours(day, day)
+            while capacity > 0 and released:
+                index = released[0][2]
+                hours = min(capacity, remaining[index])
+                if day <= self.last:
+                    self.days[index].append((day, hours))
+                remaining[index] -= hours
+                capacity -= hours
+                if remaining[index] == 0:
+                    heapq.heappop(released)
+                    self.finish[index] = day
+            day += 1
+
+    def late(self):
+        """
+        Yields (task, finish date) of tasks done after their deadline,
+        the finish date is None for tasks that are never done
+        """
+        for task, finish in zip(self.tasks, self.finish):
+            if finish is None:
+                yield task, None
+            elif finish > task.deadline.toordinal():
+                yield task, date.fromordinal(finish)
+
+    def daily(self):
+        """
+        Returns {date: [(task, hours), ...]} ordered by date
+        """
+        days = {}
+        for task, hours_per_day in zip(self.tasks, self.days):
+            for day, hours in hours_per_day:
+                days.setdefault(day, []).append((task, hours))
+        return {date.fromordinal(day): days[day] for day in sorted(days)}
+
+
+def plan_overtime_deadlines(tasks, calendar, today=None):
+    """
+    Overtime deadlines read off the day by day earliest deadline first
+    plan, yields the same (task, projected deadline) pairs in the same
+    deadline order as overtime_deadlines
+    """
+    yield from sorted(((task, finish) for task, finish in Plan(tasks, calendar, today).late()
+        if finish is not None), key=lambda pair: (pair[0].deadline, pair[0].pk or 0))
@@ -0,0 +1,53 @@
+"""
+Full text search of tasks for Task Scheduler
+"""
+
+from django.db import connection
+from django.db.models import Q
+from .models import Task
+
+FTS_TABLE = 'tasks_task_fts'
+
+# Trigram tokens match any part of a word, like the contains lookups did,
+# so queries need at least three characters to use the index
+MIN_QUERY_LENGTH = 3
+
+
+def has_search_index():
+    """
+    Checks if database has the full text index, only SQLite has one
+    """
+    return connection.vendor == 'sqlite'
+
+
+def find_tasks(query, status=''):
+    """
+    Finds tasks with query in description or category name,
+    ranked by relevance, and with status if one is given
+    """
+    tasks = Task.objects.select_related('category')
+    if status:
+        tasks = tasks.filter(status=status)
+    if not query:
+        return tasks
+    if not has_search_index() or len(query) < MIN_QUERY_LENGTH:
+        return tasks.filter(Q(description__icontains=query) | Q(category__name__icontains=query))
+    match = '"' + query.replace('"', '""') + '"'
+    return tasks.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = tasks_task.id', f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+        select={'rank': f'{FTS_TABLE}.rank'},
+        order_by=['rank'])
+
+
+def rebuild_search_index():
+    """
+    Fills full text index from tasks and categories
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, description, category) '
+            'SELECT tasks_task.id, tasks_task.description, tasks_category.name '
+            'FROM tasks_task JOIN tasks_category ON tasks_category.id = tasks_task.category_id')
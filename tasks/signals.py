@@ -0,0 +1,39 @@
+"""
+Signal handlers for Task Scheduler
+"""
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Availability, Category, DataVersion, Task
+
+
+@receiver([post_save, post_delete], sender=Availability)
+def clear_availability_cache(sender, **kwargs):
+    """
+    Clears cached availability when it changes
+    """
+    sender.clear_cache()
+
+
+@receiver([post_save, post_delete], sender=Task)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Availability)
+def bump_data_version(sender, **kwargs):
+    """
+    Marks data shown on timeline as changed
+    """
+    DataVersion.bump()
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Applies TASKS_SQLITE_PRAGMAS to new SQLite connections
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'TASKS_SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
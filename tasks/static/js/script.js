@@ -17,3 +17,88 @@ for (element of clickShowContainers) {
     buttonClose.addEventListener("click", close);
 };
 
+
+function isoDay(value) {
+    // Plotly keeps date axis ranges as milliseconds or date strings
+    if (typeof value === "number") {
+        return new Date(value).toISOString().slice(0, 10);
+    }
+    return String(value).slice(0, 10);
+};
+
+function addDays(day, days) {
+    const date = new Date(day + "T00:00:00Z");
+    date.setUTCDate(date.getUTCDate() + days);
+    return date.toISOString().slice(0, 10);
+};
+
+async function loadTimelineWindow(timeline, chart, start, end) {
+    timeline.dataset.loading = "true";
+    const params = new URLSearchParams({
+        start: start,
+        end: end,
+        loaded_start: timeline.dataset.start,
+        loaded_end: timeline.dataset.end
+    });
+    try {
+        const response = await fetch(`${timeline.dataset.url}?${params}`);
+        if (response.ok) {
+            const data = await response.json();
+            if (data.traces.length > 0) {
+                await Plotly.addTraces(chart, data.traces);
+            }
+            timeline.dataset.start = start < timeline.dataset.start ? start : timeline.dataset.start;
+            timeline.dataset.end = end > timeline.dataset.end ? end : timeline.dataset.end;
+        }
+    } finally {
+        timeline.dataset.loading = "";
+    }
+};
+
+// Fetch tasks four weeks past the visible range when panning out of loaded window
+const timeline = document.getElementById("timeline");
+if (timeline && timeline.dataset.start) {
+    const chart = timeline.querySelector(".plotly-graph-div");
+    chart.on("plotly_relayout", () => {
+        if (timeline.dataset.loading) {
+            return;
+        }
+        const range = chart.layout.xaxis.range.map(isoDay);
+        if (range[0] < timeline.dataset.start) {
+            loadTimelineWindow(timeline, chart, addDays(range[0], -28),
+                addDays(timeline.dataset.start, -1));
+        } else if (range[1] > timeline.dataset.end) {
+            loadTimelineWindow(timeline, chart, addDays(timeline.dataset.end, 1),
+                addDays(range[1], 28));
+        }
+    });
+};
+
+
+async function pollImportJob(importJob) {
+    const response = await fetch(importJob.dataset.url);
+    if (!response.ok) {
+        return;
+    }
+    const job = await response.json();
+    importJob.querySelector(".import-status").textContent =
+        `${job.name}: ${job.status}, ${job.added} tasks added, ${job.updated} updated, ` +
+        `${job.unchanged} unchanged, ${job.deleted} removed, ` +
+        `${job.rejected} tasks could not be scheduled. ${job.error}`;
+    if (!job.finished) {
+        setTimeout(() => pollImportJob(importJob), 1000);
+        return;
+    }
+    const rejected = importJob.querySelector(".import-rejected");
+    rejected.replaceChildren(...job.rejected_rows.map((row) => {
+        const item = document.createElement("li");
+        item.textContent = `Row ${row.row}: ${row.description}`;
+        return item;
+    }));
+};
+
+// Show progress of import until the import worker is done
+const importJob = document.getElementById("import-job");
+if (importJob) {
+    pollImportJob(importJob);
+};
@@ -2,15 +2,40 @@
 Test module for Tasks
 """
 import datetime
+import io
+import json
+import os
+import random
+import sqlite3
+import tempfile
 import time
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.test import TestCase
-from .models import Availability, Category, Task
+from django.test.utils import CaptureQueriesContext
+from .models import Availability, Category, DataVersion, ImportJob, ImportRow, Task, \
+    TaskLoad
+from .utils import iter_json_tasks, paginate_tasks
+from .columnar import frame_of_rows, parse_frame, read_frames
+from .search import find_tasks
+from .backends.sqlite3.base import DatabaseWrapper
+from .imports import run_import_job
+from .scheduler import PLAN_DAYS, DayRange, Plan, Schedule, overtime_deadlines, \
+    plan_overtime_deadlines, simulate
 
 class TestAvailability(TestCase):
     """
     Tests for availability model
     """
 
+    def setUp(self):
+        """
+        Clears availability cached by previous tests
+        """
+        Availability.clear_cache()
+
     def test_route_is_ok_show(self):
         """
         Tests route profile is ok
@@ -51,6 +76,12 @@ class TestTask(TestCase):
     Tests for Task model
     """
 
+    def setUp(self):
+        """
+        Clears availability cached by previous tests
+        """
+        Availability.clear_cache()
+
     def add_availability(self):
         """
         Adds availability
@@ -89,6 +120,244 @@ class TestTask(TestCase):
         )
         return task.id
 
+    def test_availability_cached(self):
+        """
+        Asserts availability is read from database once and read
+        again after it changes, in this process or in another one
+        """
+        self.add_availability()
+        Availability.get_cached()
+        with self.assertNumQueries(0):
+            Availability.get_cached()
+            Availability.get_cached()
+        today = datetime.date.today()
+        task = Task(start=today, deadline=today + datetime.timedelta(days=6))
+        with self.assertNumQueries(0):
+            self.assertEqual(task.avalible_hours(), 40)
+            self.assertEqual(task.avalible_hours(), 40)
+        availability = Availability.get_cached()
+        availability.monday = 4
+        availability.save()
+        with self.assertNumQueries(2):
+            self.assertEqual(Availability.get_cached().monday, 4)
+        # Saved by another process, whose signals only clear its own copy
+        Availability.objects.filter(pk=1).update(monday=6)
+        DataVersion.bump()
+        self.assertEqual(Availability.get_cached().monday, 4)
+        with self.settings(TASKS_AVAILABILITY_TTL=0):
+            with self.assertNumQueries(2):
+                self.assertEqual(Availability.get_cached().monday, 6)
+            with self.assertNumQueries(1):
+                Availability.get_cached()
+
+    def test_index_overtime(self):
+        """
+        Asserts timeline renders when tasks need overtime
+        """
+        self.add_availability()
+        category = Category.objects.create(name="Test")
+        for _ in range(3):
+            Task.objects.create(description='Test', category=category,
+                start=datetime.date.today(), deadline=datetime.date.today(),
+                estimated_duration=10, actual_duration=0, status='NS')
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Overtime needed')
+
+    def test_task_load_follows_task(self):
+        """
+        Asserts committed hours follow task writes
+        """
+        self.add_availability()
+        task = Task.objects.get(id=self.add_task())
+        task.estimated_duration = 6
+        task.save()
+        self.client.post(f'/task/add-hours/{task.id}', {'hours': 2})
+        self.assertEqual(TaskLoad.objects.get(task=task).hours, 4)
+        task.status = 'C'
+        task.save()
+        self.assertFalse(TaskLoad.objects.exists())
+
+    def test_rebuild_task_loads(self):
+        """
+        Asserts command reports and rebuilds stale loads
+        """
+        task_id = self.add_task()
+        TaskLoad.objects.filter(task_id=task_id).update(hours=99)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_task_loads', '--verify', stdout=io.StringIO())
+        call_command('rebuild_task_loads', stdout=io.StringIO())
+        call_command('rebuild_task_loads', '--verify', stdout=io.StringIO())
+        self.assertEqual(TaskLoad.objects.get(task_id=task_id).hours, 0)
+
+    def test_task_plan(self):
+        """
+        Asserts plan endpoint returns hours per day
+        """
+        self.add_availability()
+        category = Category.objects.create(name="Test")
+        Task.objects.create(description='Test', category=category,
+            start=datetime.date.today(), deadline=datetime.date.today(),
+            estimated_duration=30, actual_duration=0, status='NS')
+        data = self.client.get('/task/plan').json()
+        self.assertEqual(sum(day['hours'] for day in data['days']), 30)
+        self.assertEqual(len(data['late']), 1)
+        Task.objects.create(description='Never', category=category,
+            start=datetime.date.today(), deadline=datetime.date.today(),
+            estimated_duration=2000000000, actual_duration=0, status='NS')
+        data = self.client.get('/task/plan').json()
+        self.assertEqual([late['finish'] for late in data['late']][1:], [None])
+
+    def test_task_simulate(self):
+        """
+        Asserts simulation endpoint checks tasks without saving them
+        """
+        self.add_availability()
+        today = datetime.date.today().isoformat()
+        scenario = {'tasks': [{'description': 'Test', 'start': today, 'deadline': today,
+            'estimated_duration': 30}]}
+        response = self.client.post('/task/simulate', {'scenarios': [scenario]},
+            content_type='application/json')
+        result = response.json()['scenarios'][0]
+        self.assertFalse(result['tasks'][0]['fits'])
+        self.assertIsNotNone(result['tasks'][0]['deadline'])
+        self.assertFalse(Task.objects.exists())
+        response = self.client.post('/task/simulate', {'scenarios': [{'tasks': [{}]}]},
+            content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_index_not_modified(self):
+        """
+        Asserts unchanged timeline is not sent again
+        and is sent again after a task changes
+        """
+        self.add_availability()
+        task = Task.objects.create(description='Test',
+            category=Category.objects.create(name="Test"),
+            start=datetime.date.today(), deadline=datetime.date.today(),
+            estimated_duration=0, actual_duration=0, status='NS')
+        response = self.client.get('/')
+        etag = response['ETag']
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        task.description = 'Changed'
+        task.save()
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Changed')
+
+    def test_index_overtime_past_date_max(self):
+        """
+        Asserts timeline is shown for a task that
+        would only be done after date.max
+        """
+        self.add_availability()
+        Task.objects.create(description='Test',
+            category=Category.objects.create(name="Test"),
+            start=datetime.date.today(), deadline=datetime.date.today(),
+            estimated_duration=2000000000, actual_duration=0, status='NS')
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_build_figure(self):
+        """
+        Asserts timeline has one bar trace per status
+        """
+        from .timeline import build_figure  # pylint: disable=import-outside-toplevel
+        start = datetime.date(2022, 10, 18)
+        rows = [
+            {'Task': name, 'Start': start, 'Deadline': start + datetime.timedelta(days=1),
+                'End': start + datetime.timedelta(days=2), 'Status': status,
+                'Category': 'Test', 'Hours left': 4}
+            for name, status in (('A', 'Ongoing'), ('B', 'Not started'), ('C', 'Ongoing'))
+        ]
+        fig = build_figure(rows, range_y=[0, 2], range_x=[0, 1])
+        self.assertEqual([trace.name for trace in fig.data], ['Ongoing', 'Not started'])
+        self.assertEqual(list(fig.data[0].y), ['A', 'C'])
+        self.assertEqual(list(fig.data[0].x), [2 * 86400 * 1000] * 2)
+        self.assertEqual(list(fig.data[0].base), ['2022-10-18'] * 2)
+
+    def test_timeline_data(self):
+        """
+        Asserts timeline endpoint returns tasks in window that are
+        not loaded yet and leaves out old completed tasks
+        """
+        self.add_availability()
+        category = Category.objects.create(name="Test")
+        today = datetime.date.today()
+        for description, offset, status in (('Old', -60, 'C'), ('Late', -60, 'NS'),
+                ('Now', 0, 'NS'), ('Later', 60, 'NS')):
+            day = today + datetime.timedelta(days=offset)
+            Task.objects.create(description=description, category=category, start=day,
+                deadline=day, estimated_duration=0, actual_duration=0, status=status)
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Later')
+        response = self.client.get('/timeline', {
+            'start': (today - datetime.timedelta(days=90)).isoformat(),
+            'end': (today + datetime.timedelta(days=90)).isoformat(),
+            'loaded_start': (today - datetime.timedelta(days=28)).isoformat(),
+            'loaded_end': (today + datetime.timedelta(days=28)).isoformat()
+        })
+        tasks = [task for trace in response.json()['traces'] for task in trace['y']]
+        self.assertEqual(sorted(tasks), ['Late', 'Later'])
+        self.assertEqual(self.client.get('/timeline').status_code, 400)
+
+    def test_paginate_tasks(self):
+        """
+        Asserts pages follow status and deadline order, stay the same
+        when a task is added and load categories with tasks
+        """
+        category = Category.objects.create(name="Test")
+        today = datetime.date.today()
+        for i in range(5):
+            for status in ('NS', 'OG', 'C'):
+                Task.objects.create(description=f'{status}{i}', category=category,
+                    start=today, deadline=today + datetime.timedelta(days=i),
+                    estimated_duration=0, actual_duration=0, status=status)
+        expected = list(Task.objects.order_by('-status', 'deadline', 'id'))
+        first, next_page, previous_page = paginate_tasks(Task.objects.all(), per_page=4)
+        self.assertEqual(first, expected[:4])
+        self.assertIsNone(previous_page)
+        Task.objects.create(description='New', category=category, start=today,
+            deadline=today, estimated_duration=0, actual_duration=0, status='OG')
+        with self.assertNumQueries(1):
+            second, _, previous_page = paginate_tasks(Task.objects.all(), after=next_page,
+                per_page=4)
+            self.assertEqual([task.category.name for task in second], ['Test'] * 4)
+        self.assertEqual(second, expected[4:8])
+        # Going back shows the tasks right before the page, added ones included
+        current = list(Task.objects.order_by('-status', 'deadline', 'id'))
+        self.assertEqual(paginate_tasks(Task.objects.all(), before=previous_page,
+            per_page=4)[0], current[1:5])
+        response = self.client.get('/task/all', {'after': 'invalid'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_find_tasks(self):
+        """
+        Asserts search index follows task and category
+        changes and filters on status
+        """
+        category = Category.objects.create(name="Homework")
+        today = datetime.date.today()
+        report = Task.objects.create(description='Write Report', category=category,
+            start=today, deadline=today, estimated_duration=0, actual_duration=0, status='NS')
+        Task.objects.create(description='Read book', category=category,
+            start=today, deadline=today, estimated_duration=0, actual_duration=0, status='C')
+        self.assertEqual(list(find_tasks('report')), [report])
+        self.assertEqual(len(find_tasks('homew')), 2)
+        self.assertEqual(len(find_tasks('homew', 'C')), 1)
+        category.name = 'Work'
+        category.save()
+        self.assertEqual(len(find_tasks('homew')), 0)
+        self.assertEqual(len(find_tasks('wor')), 2)
+        report.delete()
+        call_command('rebuild_task_search', stdout=io.StringIO())
+        self.assertEqual(len(find_tasks('wor')), 1)
+        self.assertEqual(len(find_tasks('o"r')), 0)
+        response = self.client.get('/task/all', {'q': 'wor', 'status': ''})
+        self.assertContains(response, 'Read book')
+
     def test_route_is_ok_all(self):
         """
         Tests all tasks route is ok
@@ -153,6 +422,45 @@ class TestTask(TestCase):
         self.assertLess(total, 2)
         self.assertRedirects(response, '/task/all')
 
+    def test_add_rejected_without_write_lock(self):
+        """
+        Asserts a task that does not fit is rejected with
+        suggestions without taking the write lock
+        """
+        self.add_availability()
+        task = {
+            'description': 'Test',
+            'category': 'Test',
+            'start': '2022-10-18',
+            'deadline': '2022-10-18',
+            'status': 'NS',
+            'estimated_duration': 500,
+            'actual_duration': 0
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/task/add', task)
+        self.assertContains(response, 'Next possible deadline')
+        self.assertFalse(any('SAVEPOINT' in query['sql'] for query in queries))
+        self.assertFalse(Task.objects.exists())
+
+    def test_add_rejected_past_date_max(self):
+        """
+        Asserts a task too long for any deadline is rejected
+        """
+        self.add_availability()
+        task = {
+            'description': 'Test',
+            'category': 'Test',
+            'start': '2022-10-18',
+            'deadline': '2022-10-18',
+            'status': 'NS',
+            'estimated_duration': 2000000000,
+            'actual_duration': 0
+        }
+        response = self.client.post('/task/add', task)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Task.objects.exists())
+
     def test_show_task_route_ok(self):
         """
         Asserts that show task
@@ -173,6 +481,99 @@ class TestTask(TestCase):
         self.assertEqual(response.status_code, 200)
 
 
+class QueryPlanMixin:
+    """
+    Assertions on SQLite query plans
+    """
+
+    def assert_uses_index(self, queryset, index):
+        """
+        Asserts EXPLAIN QUERY PLAN of queryset uses index
+        """
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = '\n'.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn(f'INDEX {index}', plan)
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+
+class TestQueryPlans(QueryPlanMixin, TestCase):
+    """
+    Tests that hot queries use their indexes
+    """
+
+    today = datetime.date(2022, 10, 18)
+
+    def test_task_list(self):
+        """
+        Asserts task list pages use task list index
+        """
+        self.assert_uses_index(Task.objects.select_related('category')
+            .order_by('-status', 'deadline', 'id'), 'task_list_idx')
+        self.assert_uses_index(Task.objects.filter(status='OG', deadline__gt=self.today)
+            .order_by('-status', 'deadline', 'id'), 'task_list_idx')
+
+    def test_open_tasks(self):
+        """
+        Asserts open tasks by deadline use partial index
+        """
+        self.assert_uses_index(Task.objects.exclude(status=Task.completed)
+            .order_by('deadline', 'id'), 'task_open_deadline_idx')
+
+    def test_timeline(self):
+        """
+        Asserts timeline window uses timeline index
+        """
+        from .timeline import get_window_tasks  # pylint: disable=import-outside-toplevel
+        self.assert_uses_index(get_window_tasks(self.today, self.today), 'task_timeline_idx')
+
+    def test_task_loads(self):
+        """
+        Asserts scheduling snapshot uses task load index
+        """
+        self.assert_uses_index(TaskLoad.objects.exclude(task_id=1)
+            .filter(deadline__gte=self.today).order_by('deadline', 'task_id'),
+            'task_load_deadline_idx')
+
+
+class TestDatabase(TestCase):
+    """
+    Tests for SQLite connection profile
+    """
+
+    def test_pragmas(self):
+        """
+        Asserts pragmas are applied to new connections
+        """
+        with connection.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone()[0], 1)
+            self.assertEqual(cursor.execute('PRAGMA busy_timeout').fetchone()[0], 5000)
+
+    def test_immediate_transactions(self):
+        """
+        Asserts transactions take the write lock when they begin
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            name = os.path.join(directory, 'db.sqlite3')
+            for mode, locked in (('IMMEDIATE', True), (None, False)):
+                options = {'transaction_mode': mode} if mode else {}
+                wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': name,
+                    'OPTIONS': options}, alias='profile')
+                wrapper.ensure_connection()
+                wrapper._start_transaction_under_autocommit()  # pylint: disable=protected-access
+                other = sqlite3.connect(name, timeout=0, isolation_level=None)
+                try:
+                    other.execute('BEGIN IMMEDIATE')
+                    other.execute('ROLLBACK')
+                    self.assertFalse(locked)
+                except sqlite3.OperationalError:
+                    self.assertTrue(locked)
+                finally:
+                    other.close()
+                    wrapper.close()
+
+
 class TestCategory(TestCase):
     """
     Tests for Category model
@@ -194,3 +595,677 @@ class TestCategory(TestCase):
 
         # Check route is ok
         self.assertEqual(response.status_code, 200)
+
+
+class TestImport(TestCase):
+    """
+    Tests for importing tasks from files
+    """
+
+    def setUp(self):
+        Availability.clear_cache()
+        Availability.objects.create(monday=8, tuesday=8, wednesday=8,
+            thursday=8, friday=8, saturday=0, sunday=0)
+        start = datetime.date.today()
+        self.start = start.strftime('%d-%m-%Y')
+        self.deadline = (start + datetime.timedelta(days=14)).strftime('%d-%m-%Y')
+
+    def make_row(self, description):
+        """
+        Creates imported task with lower and upper case keys
+        """
+        return {'Description': description, 'category': 'Import', 'start date': self.start,
+            'deadline': self.deadline, 'estimated duration': '2', 'elapsed time': '0',
+            'Status': 'Not started'}
+
+    def test_iter_json_tasks(self):
+        """
+        Asserts objects are parsed one by one across chunk borders
+        """
+        rows = [self.make_row(f'Task {i} åäö') for i in range(20)]
+        content = ('\ufeff [ ' + ' ,\n'.join(json.dumps(row, ensure_ascii=False)
+            for row in rows) + ' ] ').encode('utf-8')
+        file = SimpleUploadedFile('tasks.json', content)
+        self.assertEqual(list(iter_json_tasks(file, chunk_size=7)), rows)
+        file = SimpleUploadedFile('tasks.json', b'[]')
+        self.assertEqual(list(iter_json_tasks(file)), [])
+        file = SimpleUploadedFile('tasks.json', content[:-20])
+        with self.assertRaises(ValueError):
+            list(iter_json_tasks(file, chunk_size=7))
+        file = SimpleUploadedFile('tasks.json', b'{"description": "x"}')
+        with self.assertRaises(ValueError):
+            list(iter_json_tasks(file))
+
+    def test_read_csv_frames(self):
+        """
+        Asserts semicolon separated rows are read in
+        chunks with lower case headers
+        """
+        content = ('\ufeffDescription;Category\r\nFirst åäö;Home\r\n'
+            '"Second; quoted";Work\r\n').encode('utf-8')
+        file = SimpleUploadedFile('tasks.csv', content)
+        frames = list(read_frames(file, chunk_size=1))
+        self.assertEqual([frame.to_dict('records') for frame in frames], [
+            [{'description': 'First åäö', 'category': 'Home'}],
+            [{'description': 'Second; quoted', 'category': 'Work'}]])
+        self.assertEqual(list(read_frames(SimpleUploadedFile('tasks.csv', b''))), [])
+        self.assertIsNone(read_frames(SimpleUploadedFile('tasks.txt', content)))
+
+    def test_parse_frame(self):
+        """
+        Asserts fields are parsed and rows with
+        missing or out of range values are flagged
+        """
+        rows = [self.make_row('Valid') for _ in range(8)]
+        rows[0]['start date'] = '1-2-2023'
+        rows[0]['Status'] = 'COMPLETED'
+        rows[1]['deadline'] = '31-02-2023'
+        rows[2]['estimated duration'] = 'two'
+        del rows[3]['category']
+        rows[4]['elapsed time'] = None
+        rows[5]['Status'] = 'Unknown'
+        rows[6]['estimated duration'] = '1e30'
+        rows[7]['elapsed time'] = '-1'
+        frame = parse_frame(frame_of_rows(rows))
+        self.assertEqual(frame['valid'].tolist(),
+            [True, False, False, False, False, True, False, False])
+        self.assertEqual(frame['start'][0], datetime.date(2023, 2, 1))
+        self.assertEqual(frame['status'].tolist()[::5], ['C', 'NS'])
+        self.assertEqual(frame['estimated_duration'].tolist()[0], 2)
+
+    def random_rows(self, count):
+        """
+        Creates random rows, some of them not valid
+        """
+        today = datetime.date.today()
+        rows = []
+        for i in range(count):
+            start = today + datetime.timedelta(days=random.randint(-3, 20))
+            deadline = start + datetime.timedelta(days=random.randint(0, 10))
+            rows.append({'description': f'Task {i}', 'category': f'Category {i % 3}',
+                'start date': start.strftime('%d-%m-%Y'),
+                'deadline': deadline.strftime('%d-%m-%Y'),
+                'estimated duration': str(random.randint(1, 30)), 'elapsed time': '0',
+                'status': random.choice(['Not started', 'Ongoing', 'Completed'])})
+        rows[0]['deadline'] = '31-02'
+        del rows[1]['status']
+        return rows
+
+    def test_import_task_rows(self):
+        """
+        Asserts bulk import accepts the valid rows the day by day
+        algorithm fits with the rows accepted before, and keeps loads in step
+        """
+        random.seed(19)
+        rows = self.random_rows(60)
+        today = datetime.date.today()
+        weekly = Availability.objects.get().as_list()
+        expected = [False, False]
+        accepted = []
+        for row in rows[2:]:
+            task = Task(
+                start=datetime.datetime.strptime(row['start date'], '%d-%m-%Y').date(),
+                deadline=datetime.datetime.strptime(row['deadline'], '%d-%m-%Y').date(),
+                estimated_duration=int(row['estimated duration']), actual_duration=0,
+                status='C' if row['status'] == 'Completed' else 'NS')
+            expected.append(task.status == 'C'
+                or reference_enough_time(task, accepted, weekly, today))
+            if expected[-1] and task.status != 'C':
+                accepted.append(task)
+                accepted.sort(key=lambda task: task.deadline)
+        version = DataVersion.get().version
+        file = SimpleUploadedFile('tasks.json', json.dumps(rows).encode('utf-8'))
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            job = ImportJob.objects.create(file=file, name='tasks.json')
+            run_import_job(ImportJob.claim(), batch_size=25)
+        self.assertEqual([action == ImportRow.added for action in
+            job.rows.order_by('number').values_list('action', flat=True)], expected)
+        self.assertEqual(Task.objects.count(), sum(expected))
+        self.assertEqual(TaskLoad.objects.count(), len(accepted))
+        self.assertGreater(DataVersion.get().version, version)
+
+    def test_import_route(self):
+        """
+        Asserts imported file is stored as a job, and tasks are
+        scheduled and rows with invalid values are not once it is run
+        """
+        rows = [self.make_row('First'), self.make_row('Second')]
+        rows[1]['start date'] = 'not a date'
+        file = SimpleUploadedFile('tasks.json', json.dumps(rows).encode('utf-8'))
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            response = self.client.post('/task/import', {'file': file, 'mode': 'A'})
+            job = ImportJob.objects.get()
+            self.assertRedirects(response, f'/task/import?job={job.id}')
+            self.assertFalse(Task.objects.exists())
+            self.assertEqual(self.client.get(f'/task/import/{job.id}').json()['status'],
+                'Waiting')
+
+            run_import_job(ImportJob.claim(), batch_size=1)
+            self.assertIsNone(ImportJob.claim())
+        self.assertEqual(list(Task.objects.values_list('description', flat=True)), ['First'])
+        progress = self.client.get(f'/task/import/{job.id}').json()
+        self.assertEqual((progress['status'], progress['finished'], progress['processed'],
+            progress['accepted'], progress['rejected']), ('Done', True, 2, 1, 1))
+        self.assertEqual(progress['rejected_rows'], [{'row': 2, 'description': 'Second'}])
+
+    def run_job(self, rows, mode, **columns):
+        """
+        Runs import job of rows as CSV file
+        """
+        header = list(rows[0]) + list(columns)
+        lines = [';'.join(header)] + [';'.join(map(str, list(row.values()) + values))
+            for row, *values in zip(rows, *columns.values())]
+        file = SimpleUploadedFile('tasks.csv', '\n'.join(lines).encode('utf-8'))
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            ImportJob.objects.create(file=file, name='tasks.csv', mode=mode)
+            return run_import_job(ImportJob.claim(), batch_size=2)
+
+    def test_import_job_update(self):
+        """
+        Asserts reimported rows are matched by key and only
+        changed rows are written, sync removes tasks not in file
+        """
+        rows = [self.make_row(f'Task {i}') for i in range(4)]
+        self.run_job(rows, ImportJob.add)
+        other = Task.objects.create(description='Other', category=Category.objects.get(),
+            start=datetime.date.today(), deadline=datetime.date.today())
+        rows[1]['estimated duration'] = '3'
+        rows[2]['Status'] = 'Completed'
+        rows.append(self.make_row('Task 4'))
+        rows.append(self.make_row('Task 1'))
+        rows.append(self.make_row('Too long'))
+        rows[-1]['estimated duration'] = '500'
+
+        with self.assertNumQueries(42):
+            job = self.run_job(rows, ImportJob.update)
+        progress = job.progress()
+        self.assertEqual([progress[key] for key in ('added', 'updated', 'unchanged',
+            'rejected', 'deleted')], [1, 2, 2, 2, 0])
+        self.assertEqual(Task.objects.get(description='Task 1').estimated_duration, 3)
+        self.assertFalse(TaskLoad.objects.filter(task__description='Task 2').exists())
+        self.assertEqual(TaskLoad.objects.get(task__description='Task 1').hours, 3)
+        self.assertEqual(Task.objects.count(), 6)
+
+        # Only open tasks that came from imports are removed
+        job = self.run_job(rows[:2], ImportJob.sync)
+        self.assertEqual((job.unchanged, job.deleted), (2, 2))
+        self.assertTrue(Task.objects.filter(id=other.id).exists())
+        self.assertTrue(Task.objects.filter(description='Task 2').exists())
+
+        job = self.run_job(rows[:2], ImportJob.update, **{'external id': ['a', 'b']})
+        self.assertEqual(job.updated, 2)
+        job = self.run_job([self.make_row('Renamed')], ImportJob.update,
+            **{'external id': ['a']})
+        self.assertEqual(job.updated, 1)
+        self.assertEqual(sorted(Task.objects.values_list('description', flat=True)),
+            ['Other', 'Renamed', 'Task 1', 'Task 2'])
+
+    def test_import_job_sync_keeps_rejected_rows(self):
+        """
+        Asserts sync keeps tasks whose rows are in file but rejected
+        """
+        rows = [self.make_row('First'), self.make_row('Second')]
+        self.run_job(rows, ImportJob.add)
+        rows[1]['estimated duration'] = 'four'
+        rows.append(self.make_row('First'))
+        job = self.run_job(rows, ImportJob.sync)
+        self.assertEqual((job.unchanged, job.processed - job.accepted, job.deleted), (1, 2, 0))
+        self.assertEqual(sorted(Task.objects.values_list('description', flat=True)),
+            ['First', 'Second'])
+
+    def test_import_job_update_keeps_capacity(self):
+        """
+        Asserts rows are checked against the old hours
+        of tasks updated further down the file
+        """
+        today = datetime.date.today()
+        monday = (today + datetime.timedelta(days=7 - today.weekday())).strftime('%d-%m-%Y')
+        rows = [self.make_row('First'), self.make_row('Second')]
+        for row in rows:
+            row.update({'start date': monday, 'deadline': monday, 'estimated duration': '4'})
+        self.run_job(rows, ImportJob.add)
+        for row in rows:
+            row['estimated duration'] = '8'
+        job = self.run_job(rows, ImportJob.update)
+        self.assertEqual((job.updated, job.processed - job.accepted), (0, 2))
+        self.assertEqual(sum(TaskLoad.objects.values_list('hours', flat=True)), 8)
+
+    def test_export_route(self):
+        """
+        Asserts exported files stream matching tasks and
+        are imported again without changes
+        """
+        rows = [self.make_row(f'Task {i} åäö') for i in range(3)]
+        rows[2]['Status'] = 'Completed'
+        self.run_job(rows, ImportJob.add)
+        response = self.client.get('/task/export')
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content)
+        self.assertEqual(content.decode('utf-8').splitlines()[:2], [
+            'Description;Category;Start date;Deadline;Estimated duration;'
+                'Elapsed time;Status;External id',
+            f'Task 0 åäö;Import;{self.start};{self.deadline};2;0;Not started;'])
+
+        for export_format in ('csv', 'json', 'ndjson'):
+            response = self.client.get('/task/export', {'format': export_format})
+            file = SimpleUploadedFile(f'tasks.{export_format}',
+                b''.join(response.streaming_content))
+            with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+                ImportJob.objects.create(file=file, name=file.name, mode=ImportJob.sync)
+                job = run_import_job(ImportJob.claim())
+            self.assertEqual((job.processed, job.unchanged, job.deleted), (3, 3, 0))
+
+        response = self.client.get('/task/export', {'format': 'json', 'q': '', 'status': 'C'})
+        self.assertEqual([task['Description'] for task in
+            json.loads(b''.join(response.streaming_content))], ['Task 2 åäö'])
+        response = self.client.get('/task/export', {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_import_job_failed(self):
+        """
+        Asserts rows before the part of a file that
+        can not be read are kept and the job fails
+        """
+        content = ('[' + json.dumps(self.make_row('First')) + ', {"description"').encode('utf-8')
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            job = ImportJob.objects.create(file=SimpleUploadedFile('tasks.json', content),
+                name='tasks.json')
+            job = run_import_job(ImportJob.claim(), batch_size=1)
+        self.assertEqual(job.status, ImportJob.failed)
+        self.assertTrue(job.error.startswith('Could not import row 2'))
+        self.assertEqual(job.processed, 1)
+        self.assertEqual(Task.objects.count(), 1)
+
+
+def reference_enough_time(task, tasks, weekly, today):
+    """
+    Day by day feasibility check used before the scheduling engine
+    """
+    def date_range(item):
+        start = max(item.start, today)
+        return [start + datetime.timedelta(days=i)
+            for i in range((item.deadline - start).days + 1)]
+
+    def hours(days):
+        return sum(weekly[day.weekday()] for day in days)
+
+    hours_left = task.estimated_duration - task.actual_duration
+    self_range = date_range(task)
+    if hours(self_range) - hours_left < 0:
+        return False
+    for other in tasks:
+        other_range = date_range(other)
+        if other.status != 'C' and any(day in other_range for day in self_range):
+            self_range.extend(x for x in other_range if x not in self_range)
+            hours_left += other.estimated_duration - other.actual_duration
+            if hours(self_range) - hours_left < 0:
+                return False
+    return True
+
+
+def reference_plan(tasks, calendar, today):
+    """
+    Earliest deadline first plan handing out every day in turn,
+    returns hours per day and finish day of each open task
+    """
+    tasks = [task for task in tasks if task.status != 'C'
+        and task.estimated_duration - task.actual_duration > 0]
+    remaining = [task.estimated_duration - task.actual_duration for task in tasks]
+    first = [max(task.start.toordinal(), today) for task in tasks]
+    days = [[] for _ in tasks]
+    finish = [None for _ in tasks]
+    day = today
+    while any(remaining):
+        released = sorted((task.deadline, task.pk or 0, index)
+            for index, task in enumerate(tasks) if first[index] <= day and remaining[index])
+        capacity = calendar.hours(day, day)
+        for _, _, index in released:
+            hours = min(capacity, remaining[index])
+            if hours > 0:
+                days[index].append((day, hours))
+                remaining[index] -= hours
+                capacity -= hours
+                if remaining[index] == 0:
+                    finish[index] = day
+        day += 1
+    return days, finish
+
+
+class TestSchedule(TestCase):
+    """
+    Tests for scheduling engine
+    """
+
+    today = datetime.date(2022, 10, 18)
+    availability = Availability(monday=8, tuesday=8, wednesday=8,
+        thursday=8, friday=4, saturday=0, sunday=0)
+
+    def make_task(self, start, deadline, hours, status='NS'):
+        """
+        Creates unsaved task relative to today
+        """
+        return Task(
+            description='Test',
+            start=self.today + datetime.timedelta(days=start),
+            deadline=self.today + datetime.timedelta(days=deadline),
+            estimated_duration=hours,
+            actual_duration=0,
+            status=status
+        )
+
+    def random_tasks(self, rand, count):
+        """
+        Creates random tasks ordered by deadline
+        """
+        tasks = []
+        for _ in range(count):
+            start = rand.randint(-10, 30)
+            tasks.append(self.make_task(start, start + rand.randint(-3, 20),
+                rand.randint(0, 60), rand.choice(['NS', 'OG', 'C'])))
+        return sorted(tasks, key=lambda task: task.deadline)
+
+    def test_hours(self):
+        """
+        Asserts hours match summing day by day
+        """
+        schedule = Schedule([], self.availability, self.today)
+        weekly = self.availability.as_list()
+        first = self.today.toordinal()
+        for length in range(0, 20):
+            expected = sum(weekly[(self.today + datetime.timedelta(days=i)).weekday()]
+                for i in range(length))
+            self.assertEqual(schedule.hours(first, first + length - 1), expected)
+
+    def test_day_range(self):
+        """
+        Asserts day range operations match date lists
+        """
+        task = self.make_task(-3, 4, 0)
+        day_range = DayRange.of_task(task, self.today.toordinal())
+        self.assertEqual(len(day_range), 5)
+        self.assertEqual(list(day_range.dates()),
+            [self.today + datetime.timedelta(days=i) for i in range(5)])
+        first = self.today.toordinal()
+        self.assertTrue(day_range.overlaps(DayRange(first + 4, first + 9)))
+        self.assertFalse(day_range.overlaps(DayRange(first + 5, first + 9)))
+        self.assertFalse(day_range.overlaps(DayRange(first + 3, first + 2)))
+        self.assertEqual(day_range & DayRange(first + 2, first + 9), DayRange(first + 2, first + 4))
+        self.assertEqual(day_range | DayRange(first + 2, first + 9), DayRange(first, first + 9))
+        self.assertEqual(len(DayRange(first, first + 2) & DayRange(first + 5, first + 9)), 0)
+
+    def test_calendar_hours(self):
+        """
+        Asserts calendar ranges match summing day by day
+        for every weekday offset
+        """
+        calendar = self.availability.get_calendar()
+        weekly = self.availability.as_list()
+        for offset in range(7):
+            first = self.today + datetime.timedelta(days=offset)
+            for length in range(30):
+                last = first + datetime.timedelta(days=length)
+                expected = sum(weekly[(first + datetime.timedelta(days=i)).weekday()]
+                    for i in range(length + 1))
+                self.assertEqual(calendar.hours(first.toordinal(), last.toordinal()),
+                    expected)
+
+    def test_enough_time_matches_reference(self):
+        """
+        Asserts engine gives same answer as day by day algorithm
+        """
+        rand = random.Random(1)
+        weekly = self.availability.as_list()
+        for _ in range(200):
+            tasks = self.random_tasks(rand, rand.randint(0, 12))
+            task = self.random_tasks(rand, 1)[0]
+            task.status = 'NS'
+            schedule = Schedule(tasks, self.availability, self.today)
+            self.assertEqual(schedule.enough_time(task),
+                reference_enough_time(task, tasks, weekly, self.today))
+
+    def test_earliest_deadline_matches_reference(self):
+        """
+        Asserts earliest deadline is the first deadline
+        the day by day algorithm accepts
+        """
+        rand = random.Random(2)
+        weekly = self.availability.as_list()
+        for _ in range(200):
+            tasks = self.random_tasks(rand, rand.randint(0, 12))
+            task = self.random_tasks(rand, 1)[0]
+            task.status = 'NS'
+            schedule = Schedule(tasks, self.availability, self.today)
+            expected = task.deadline
+            while not reference_enough_time(task, tasks, weekly, self.today):
+                task.deadline += datetime.timedelta(days=1)
+            task.deadline, expected = expected, task.deadline
+            self.assertEqual(schedule.earliest_deadline(task), expected)
+
+    def test_earliest_deadline_joins_match_segments(self):
+        """
+        Asserts deadline found adding tasks to the union as the deadline
+        moves is the one found walking every range of deadlines again
+        """
+        rand = random.Random(4)
+        for _ in range(500):
+            tasks = self.random_tasks(rand, rand.randint(0, 30))
+            for task in tasks:
+                task.actual_duration = rand.randint(0, 20)
+            schedule = Schedule(tasks, self.availability, self.today)
+            first, last, hours = schedule.span(self.make_task(
+                rand.randint(0, 20), rand.randint(20, 40), rand.randint(0, 400)))
+            self.assertEqual(schedule.earliest_deadline_by_joins(first, last, hours),
+                schedule.earliest_deadline_by_segments(first, last, hours))
+
+    def test_earliest_deadline_many_tasks(self):
+        """
+        Asserts a deadline years out among thousands of
+        tasks is found without walking them once per start day
+        """
+        rand = random.Random(5)
+        tasks = []
+        for _ in range(5000):
+            start = rand.randint(0, 3000)
+            tasks.append(self.make_task(start, start + rand.randint(0, 30),
+                rand.randint(1, 10)))
+        tasks.sort(key=lambda task: task.deadline)
+        schedule = Schedule(tasks, self.availability, self.today)
+        began = time.perf_counter()
+        deadline = schedule.earliest_deadline(self.make_task(0, 5, 50000))
+        self.assertLess(time.perf_counter() - began, 5)
+        self.assertGreater(deadline, self.today + datetime.timedelta(days=3000))
+
+    def test_earliest_deadline_past_date_max(self):
+        """
+        Asserts no deadline is found when it would be after date.max
+        """
+        schedule = Schedule([], self.availability, self.today)
+        self.assertIsNone(schedule.earliest_deadline(self.make_task(0, 5, 2000000000)))
+        self.assertIsNone(schedule.latest_start(self.make_task(0, 5, 2000000000)))
+
+    def test_earliest_deadline_without_availability(self):
+        """
+        Asserts no deadline is found without avalible hours
+        """
+        availability = Availability(monday=0, tuesday=0, wednesday=0,
+            thursday=0, friday=0, saturday=0, sunday=0)
+        schedule = Schedule([], availability, self.today)
+        self.assertIsNone(schedule.earliest_deadline(self.make_task(0, 5, 1)))
+
+    def test_latest_start_matches_reference(self):
+        """
+        Asserts latest start is the first start date stepping
+        back from the deadline the day by day algorithm accepts
+        """
+        rand = random.Random(3)
+        weekly = self.availability.as_list()
+        for _ in range(200):
+            tasks = self.random_tasks(rand, rand.randint(0, 12))
+            task = self.random_tasks(rand, 1)[0]
+            task.status = 'NS'
+            schedule = Schedule(tasks, self.availability, self.today)
+            task.start = task.deadline
+            while not reference_enough_time(task, tasks, weekly, self.today) \
+                    and task.start >= self.today:
+                task.start -= datetime.timedelta(days=1)
+            expected = task.start if task.start >= self.today \
+                or reference_enough_time(task, tasks, weekly, self.today) else None
+            self.assertEqual(schedule.latest_start(task), expected)
+
+    def test_latest_start_tables_match_segments(self):
+        """
+        Asserts start date found with range tables is the one
+        found walking every range of start dates again
+        """
+        rand = random.Random(7)
+        for _ in range(500):
+            tasks = self.random_tasks(rand, rand.randint(0, 30))
+            for task in tasks:
+                task.actual_duration = rand.randint(0, 20)
+            schedule = Schedule(tasks, self.availability, self.today)
+            last = (self.today + datetime.timedelta(days=rand.randint(0, 40))).toordinal()
+            hours = rand.randint(0, 200)
+            self.assertEqual(schedule.latest_start_by_tables(last, hours),
+                schedule.latest_start_by_segments(last, hours))
+
+    def test_latest_start_many_tasks(self):
+        """
+        Asserts a start date years back among thousands of
+        tasks is found without walking them once per deadline
+        """
+        rand = random.Random(5)
+        tasks = []
+        for _ in range(5000):
+            start = rand.randint(0, 3000)
+            tasks.append(self.make_task(start, start + rand.randint(0, 30),
+                rand.randint(1, 3)))
+        tasks.sort(key=lambda task: task.deadline)
+        schedule = Schedule(tasks, self.availability, self.today)
+        began = time.perf_counter()
+        start = schedule.latest_start(self.make_task(0, 3000, 5000))
+        self.assertLess(time.perf_counter() - began, 5)
+        self.assertLess(start, self.today + datetime.timedelta(days=2000))
+
+    def test_overtime_deadlines(self):
+        """
+        Asserts hours carry over to tasks due later
+        """
+        calendar = self.availability.get_calendar()
+        # Tuesday to Thursday has 24 hours, friday adds 4
+        first = self.make_task(0, 2, 16)
+        second = self.make_task(0, 2, 12)
+        third = self.make_task(3, 5, 4)
+        done = self.make_task(0, 1, 40, 'C')
+        projected = list(overtime_deadlines([third, first, done, second],
+            calendar, self.today))
+        self.assertEqual(projected, [(second, self.today + datetime.timedelta(days=3)),
+            (third, self.today + datetime.timedelta(days=6))])
+
+    def test_overtime_deadlines_earlier_start_later_deadline(self):
+        """
+        Asserts hours before a task due sooner starts are not lost
+        to a task starting earlier and due later
+        """
+        every_day = Availability(monday=8, tuesday=8, wednesday=8, thursday=8,
+            friday=8, saturday=8, sunday=8)
+        calendar = every_day.get_calendar()
+        first = self.make_task(0, 9, 20)
+        second = self.make_task(7, 8, 16)
+        schedule = Schedule([second, first], every_day, self.today)
+        self.assertTrue(schedule.enough_time(first))
+        self.assertEqual(list(overtime_deadlines([first, second], calendar, self.today)), [])
+        second.estimated_duration = 24
+        self.assertEqual(list(overtime_deadlines([first, second], calendar, self.today)),
+            [(second, self.today + datetime.timedelta(days=9))])
+
+    def test_overtime_deadlines_past_date_max(self):
+        """
+        Asserts overtime ending after date.max is left out
+        and does not hold back tasks that can be projected
+        """
+        calendar = self.availability.get_calendar()
+        first = self.make_task(0, 2, 40)
+        second = self.make_task(0, 3, 2000000000)
+        self.assertEqual(list(overtime_deadlines([first, second], calendar, self.today)),
+            [(first, self.today + datetime.timedelta(days=7))])
+
+    def test_overtime_deadlines_match_plan(self):
+        """
+        Asserts projected overtime is where the
+        earliest deadline first plan is late
+        """
+        rand = random.Random(6)
+        calendar = self.availability.get_calendar()
+        for _ in range(300):
+            tasks = self.random_tasks(rand, rand.randint(0, 30))
+            self.assertEqual(
+                list(overtime_deadlines(tasks, calendar, self.today)),
+                list(plan_overtime_deadlines(tasks, calendar, self.today)))
+
+    def test_plan(self):
+        """
+        Asserts earliest deadline gets hours first and
+        a later task takes the hours left over
+        """
+        calendar = self.availability.get_calendar()
+        later = self.make_task(0, 6, 10)
+        sooner = self.make_task(1, 2, 12)
+        plan = Plan([later, sooner], calendar, self.today)
+        daily = plan.daily()
+        day = lambda offset: self.today + datetime.timedelta(days=offset)
+        self.assertEqual(daily[day(0)], [(later, 8)])
+        self.assertEqual(daily[day(1)], [(sooner, 8)])
+        self.assertEqual(daily[day(2)], [(later, 2), (sooner, 4)])
+        self.assertEqual(list(plan.late()), [])
+        sooner.estimated_duration = 20
+        self.assertEqual(list(Plan([later, sooner], calendar, self.today).late()),
+            [(sooner, day(3))])
+
+    def test_plan_matches_reference(self):
+        """
+        Asserts skipping whole days hands out the
+        same hours as going day by day
+        """
+        rand = random.Random(8)
+        calendar = self.availability.get_calendar()
+        for _ in range(300):
+            tasks = self.random_tasks(rand, rand.randint(0, 30))
+            plan = Plan(tasks, calendar, self.today)
+            self.assertEqual((plan.days, plan.finish),
+                reference_plan(tasks, calendar, self.today.toordinal()))
+
+    def test_plan_never_done(self):
+        """
+        Asserts a task only done after date.max is late without a
+        finish date and does not hold back tasks due sooner
+        """
+        calendar = self.availability.get_calendar()
+        sooner = self.make_task(0, 2, 40)
+        never = self.make_task(0, 3, 2000000000)
+        began = time.perf_counter()
+        plan = Plan([never, sooner], calendar, self.today)
+        self.assertLess(time.perf_counter() - began, 5)
+        self.assertEqual(list(plan.late()),
+            [(never, None), (sooner, self.today + datetime.timedelta(days=7))])
+        last = max(plan.daily())
+        self.assertLess(last - self.today, datetime.timedelta(days=PLAN_DAYS))
+        self.assertGreater(last - self.today, datetime.timedelta(days=PLAN_DAYS - 7))
+        self.assertEqual(list(plan_overtime_deadlines([never, sooner], calendar, self.today)),
+            [(sooner, self.today + datetime.timedelta(days=7))])
+
+    def test_simulate(self):
+        """
+        Asserts hypothetical tasks see the ones added before them
+        and a scenario can use other availability
+        """
+        first = self.make_task(0, 2, 16)
+        second = self.make_task(0, 2, 16)
+        more_time = Availability(monday=8, tuesday=12, wednesday=12,
+            thursday=12, friday=8, saturday=0, sunday=0)
+        results = simulate([], self.availability, [([first, second], None),
+            ([first, second], more_time)], self.today)
+        self.assertEqual([checked['fits'] for checked in results[0]['tasks']], [True, False])
+        self.assertEqual(results[0]['tasks'][1]['deadline'],
+            self.today + datetime.timedelta(days=6))
+        self.assertEqual(results[0]['overtime'], [])
+        self.assertEqual([checked['fits'] for checked in results[1]['tasks']], [True, True])
@@ -0,0 +1,180 @@
+"""
+Timeline chart for Task Scheduler, imported only when a chart is built
+"""
+
+import datetime
+import json
+from time import time
+import plotly.graph_objects as go
+
+from django.db.models import Q
+
+from .models import Availability, Task
+from .scheduler import overtime_deadlines
+
+COLORS = {
+    'Not started': '#6c757d',
+    'Ongoing': '#ffca3a',
+    'Completed': '#8ac926',
+    'Overtime needed': 'rgba(255, 89, 94, 0.5)',
+}
+
+DAY = 86400 * 1000
+WEEK = 7 * DAY
+
+# Weeks before and after today loaded with the page,
+# the rest is fetched while panning
+WINDOW_WEEKS = 4
+
+HOVER = ('<b>%{hovertext}</b><br><br>Start=%{base|%b %e}<br>'
+    'Deadline=%{customdata[0]|%b %e}<br>Status=%{customdata[1]}<br>'
+    'Category=%{customdata[2]}<br>Hours left=%{customdata[3]}<extra></extra>')
+
+
+def get_possible_deadlines(tasks):
+    """
+    Creates array of objects if overtime is needed
+    on any task
+    """
+    calendar = Availability.get_cached().get_calendar()
+    return [
+        {
+            'Task': task.description,
+            'Start': task.deadline + datetime.timedelta(days=1),
+            'Deadline': deadline,
+            'End': deadline + datetime.timedelta(days=1),
+            'Status': 'Overtime needed',
+            'Category': task.category.name,
+            'Hours left': task.estimated_duration - task.actual_duration
+        } for task, deadline in overtime_deadlines(tasks, calendar)
+    ]
+
+
+def build_figure(rows, range_y, range_x):
+    """
+    Builds timeline figure from rows, one horizontal
+    bar trace per status like plotly express timeline
+    """
+    fig = go.Figure()
+    for status in dict.fromkeys(row['Status'] for row in rows):
+        group = [row for row in rows if row['Status'] == status]
+        fig.add_trace(go.Bar(
+            name=status,
+            legendgroup=status,
+            orientation='h',
+            marker_color=COLORS[status],
+            base=[row['Start'].isoformat() for row in group],
+            x=[(row['End'] - row['Start']).days * DAY for row in group],
+            y=[row['Task'] for row in group],
+            hovertext=[row['Task'] for row in group],
+            customdata=[[row['Deadline'].isoformat(), row['Status'], row['Category'],
+                row['Hours left']] for row in group],
+            hovertemplate=HOVER
+        ))
+    fig.update_layout(barmode='overlay', legend_title_text='Status')
+    if range_x is not None:
+        fig.update_xaxes(range=range_x)
+    if range_y is not None:
+        fig.update_yaxes(range=range_y)
+    return fig
+
+
+def get_window_tasks(start, end, loaded=None):
+    """
+    Gets tasks shown on timeline between start and end dates.
+    Completed tasks are shown until two weeks after their deadline.
+    Tasks in the loaded (start, end) window are left out.
+    """
+    tasks = Task.objects.select_related('category').filter(
+        start__lte=end, deadline__gte=start).filter(
+            Q(deadline__gte=datetime.date.today() - datetime.timedelta(days=14))
+            | ~Q(status=Task.completed))
+    if loaded is not None:
+        tasks = tasks.exclude(start__lte=loaded[1], deadline__gte=loaded[0])
+    return tasks.order_by('start', '-deadline')
+
+
+def get_window_rows(start, end, loaded=None):
+    """
+    Creates timeline rows of tasks between start and end dates,
+    returns rows and if overtime could be calculated
+    """
+    rows = [
+        {
+            'Task': task.description,
+            'Start': task.start,
+            'Deadline': task.deadline,
+            'End': task.deadline + datetime.timedelta(days=1),
+            'Status': task.get_status_display(),
+            'Category': task.category.name,
+            'Hours left': task.estimated_duration - task.actual_duration
+        } for task in get_window_tasks(start, end, loaded)
+    ]
+    overtime = Availability.get_cached().get_hour_per_week() > 0
+    if overtime:
+        # Overtime depends on every open task, only rows in window are kept
+        open_tasks = Task.objects.select_related('category').exclude(status=Task.completed)
+        rows += [
+            row for row in get_possible_deadlines(open_tasks)
+            if row['Start'] <= end and row['Deadline'] >= start
+            and (loaded is None or row['Start'] > loaded[1] or row['Deadline'] < loaded[0])
+        ]
+    return rows, overtime
+
+
+def get_window(today=None):
+    """
+    Returns (start, end) dates of window first shown
+    """
+    today = today or datetime.date.today()
+    return today - datetime.timedelta(weeks=WINDOW_WEEKS), \
+        today + datetime.timedelta(weeks=WINDOW_WEEKS)
+
+
+def get_window_traces(start, end, loaded):
+    """
+    Creates plotly traces of timeline rows between start and end
+    dates that are not in the loaded window, as JSON data
+    """
+    rows, _ = get_window_rows(start, end, loaded)
+    fig = build_figure(rows, range_y=None, range_x=None)
+    fig.update_traces(showlegend=False)
+    return json.loads(fig.to_json())['data']
+
+
+def build_timeline():
+    """
+    Renders timeline chart of tasks in first window,
+    returns chart html and if overtime could be calculated
+    """
+    today = time() * 1000
+    start, end = get_window()
+    task_data, overtime = get_window_rows(start, end)
+    fig = build_figure(task_data, range_y=[0, len(task_data) - 1],
+        range_x=[today - WEEK, today + WEEK])
+    fig.update_layout(dragmode='pan',
+    font_color='#10002B',
+    font_family='Montserrat',
+    title={
+        'text': "Task Timeline",
+        'xanchor': 'center',
+        'yanchor': 'top',
+        'y':1,
+        'x':0.3,
+        'font':{'size':28 }
+        }
+        )
+    fig.update_yaxes(autorange="reversed", title=None, automargin=True)
+    fig.update_xaxes(
+        tickformat="%a %e/%m \n w.%W",
+        type = 'date',
+        tickformatstops=(dict(dtickrange=[None, 604800000], value="%a %e/%m \n w.%W"),
+            dict(dtickrange=[604800000, "M1"], value="w.%W"),
+            dict(dtickrange=["M1", "M12"], value="%b %Y"),
+            dict(dtickrange=["M12", None], value="%Y Y"))
+    )
+    fig.add_vline(x=today, line_width=2, line_color="#10002B",
+        annotation={'text': 'Now', 'font': {'size': 14, 'color': '#10002B'},
+        'yshift': 20, 'xshift': -15})
+    return {'chart': fig.to_html(full_html=False, include_plotlyjs=False),
+        'overtime': overtime, 'start': start, 'end': end}
@@ -7,9 +7,14 @@ from . import views
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('timeline', views.timeline_data, name='timeline data'),
     path('task/add', views.add_task, name='add task'),
     path('task/import', views.import_tasks, name='import tasks'),
+    path('task/import/<int:job_id>', views.import_progress, name='import progress'),
     path('task/all', views.show_tasks, name='all tasks'),
+    path('task/export', views.export_tasks, name='export tasks'),
+    path('task/plan', views.task_plan, name='task plan'),
+    path('task/simulate', views.task_simulate, name='simulate tasks'),
     path('task/<int:task_id>', views.show_single_task, name='single task'),
     path('task/remove/<int:task_id>', views.remove_task, name='remove task'),
     path('task/update/<int:task_id>', views.update_task, name='update task'),
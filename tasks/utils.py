@@ -1,13 +1,16 @@
 """
 Utility functions for Task scheduler
 """
+import codecs
 import json
-import csv
-import io
 from datetime import date
-from django.contrib import messages
 from django.core.exceptions import ObjectDoesNotExist
-from .models import Task, Category, Availability
+from django.db.models import Q
+from .models import Task, TaskLoad, Category, Availability, ImportRow
+from .forms import AvailabilityForm
+
+TASKS_PER_PAGE = 50
+IMPORT_BATCH_SIZE = 1000
 
 def get_category_object(name):
     """
@@ -20,87 +23,255 @@ def get_category_object(name):
         category.save()
     return category
 
-def get_status(status):
+def get_category_objects(names):
     """
-    Gets Category model object if exists or create a new Category object
+    Gets Category model objects by name, missing
+    categories are created in one query
     """
-    match status.lower():
-        case "not started":
-            return "NS"
-        case "ongoing":
-            return "OG"
-        case "completed":
-            return "C"
-        case _:
-            return "NS"
+    categories = {category.name: category
+        for category in Category.objects.filter(name__in=names)}
+    missing = [Category(name=name) for name in dict.fromkeys(names) if name not in categories]
+    for category in Category.objects.bulk_create(missing):
+        categories[category.name] = category
+    return categories
 
+def import_batch(frame, schedule):
+    """
+    Adds valid tasks of parsed frame that fit schedule, accepted
+    tasks are added to schedule. Returns task added for each row,
+    None for rows that were not.
+    """
+    categories = get_category_objects(
+        frame.loc[frame['valid'], 'category'].unique().tolist())
+    tasks = [
+        Task(
+            description=row.description,
+            category=categories[row.category],
+            start=row.start,
+            deadline=row.deadline,
+            estimated_duration=row.estimated_duration,
+            actual_duration=row.actual_duration,
+            status=row.status,
+            external_id=row.external_id or None
+        ) if row.valid else None for row in frame.itertuples(index=False)
+    ]
+    accepted = []
+    for task in tasks:
+        if task is not None and schedule.enough_time(task):
+            accepted.append(task)
+            if task.status != Task.completed:
+                schedule.insert(task.start, task.deadline,
+                    task.estimated_duration - task.actual_duration)
+    # Bulk inserts skip Task.save, so loads are added here
+    Task.objects.bulk_create(accepted)
+    TaskLoad.objects.bulk_create([TaskLoad.of_task(task) for task in accepted
+        if task.status != Task.completed])
+    accepted = set(map(id, accepted))
+    return [task if id(task) in accepted else None for task in tasks]
 
-def has_correct_structure(data):
+def get_existing_tasks(frame):
     """
-    Check that data has correct structure
+    Gets tasks matching rows in parsed frame, by external id
+    and by description, category and start date
     """
-    if all(key in data for key in ('description', 'category', 'start date',
-        'deadline', 'estimated duration', 'elapsed time', 'status')):
-        return True
-    return False
-
-def add_task_from_dict(task):
-    """
-    Adds tasks from a dict
-    """
-    start_date = list(map(int, task['start date'].split('-')))
-    deadline = list(map(int, task['deadline'].split('-')))
-    new_task = Task(
-        description = task['description'],
-        start = date(start_date[2], start_date[1], start_date[0]),
-        deadline = date(deadline[2], deadline[1], deadline[0]),
-        estimated_duration = int(task['estimated duration']),
-        actual_duration = int(task['elapsed time']),
-        category=get_category_object(task['category']),
-        status=get_status(task['status'])
-    )
-    if new_task.enough_time():
-        new_task.save()
-        return True
-    return False
-
-def handle_uploaded_file(request):
-    """
-    Handles imported file containing tasks
-    """
-    file = request.FILES['file']
-    schdueled = []
-    not_schdueled = []
-    if file.name.endswith("json"):
-    # JSON
-        data = json.loads(file.read())
-        for task in data:
-            task = dict((k.lower(), v) for k, v in task .items())
-            if has_correct_structure(task) and add_task_from_dict(task):
-                schdueled.append(task['description'])
-            else:
-                not_schdueled.append(task['description'])
-    # CSV
-    elif file.name.endswith("csv"):
-        csv_file = file.read()
-        reader = csv.DictReader(io.StringIO(csv_file.decode('utf-8')), delimiter=";")
-        for row in reader:
-            row = dict((k.lower(), v) for k, v in row .items())
-            if has_correct_structure(row) and add_task_from_dict(row):
-                schdueled.append(row['description'])
-            else:
-                not_schdueled.append(row['description'])
+    by_id = frame['external_id'] != ''
+    existing = {}
+    if by_id.any():
+        for task in Task.objects.select_related('category').filter(
+                external_id__in=frame.loc[by_id, 'external_id'].unique().tolist()):
+            existing.setdefault(('external id', task.external_id), task)
+    for task in Task.objects.select_related('category').filter(
+            description__in=frame['description'].unique().tolist(),
+            start__in=frame['start'].dropna().unique().tolist()):
+        existing.setdefault(('task', task.description, task.category.name, task.start), task)
+    return existing
+
+def find_task(existing, row):
+    """
+    Returns key of imported row and the task it matches, or None.
+    Rows with an external id only match tasks by description,
+    category and start date that have no external id.
+    """
+    key = ('task', row.description, row.category, row.start)
+    task = existing.get(key)
+    if row.external_id:
+        key = ('external id', row.external_id)
+        if task is not None and task.external_id is not None:
+            task = None
+        task = existing.get(key, task)
+    return key, task
+
+def upsert_batch(frame, seen):
+    """
+    Adds new rows of parsed frame and updates tasks of changed rows,
+    unchanged rows are not checked against the schedule. Ids of
+    matched and added tasks are added to seen, rows of tasks
+    already seen are rejected.
+    Returns ImportRow action and task added, updated or matched of each row.
+    """
+    existing = get_existing_tasks(frame)
+    categories = get_category_objects(
+        frame.loc[frame['valid'], 'category'].unique().tolist())
+    fields = ('description', 'start', 'deadline', 'estimated_duration',
+        'actual_duration', 'status')
+    rows = []
+    keys = set()
+    # Tasks of rejected rows are still in file, so sync keeps them
+    matched = set()
+    for row in frame.itertuples(index=False):
+        key, old = find_task(existing, row)
+        if not row.valid or key in keys or (old is not None and old.id in seen):
+            # Only the first row of a key is imported
+            if old is not None:
+                matched.add(old.id)
+            rows.append((None, None))
+            continue
+        keys.add(key)
+        task = Task(id=old.id if old else None, category=categories[row.category],
+            external_id=row.external_id or (old.external_id if old else None),
+            **{field: getattr(row, field) for field in fields})
+        if old is not None and old.category_id == task.category_id \
+                and old.external_id == task.external_id \
+                and all(getattr(old, field) == getattr(task, field) for field in fields):
+            task = None
+        rows.append((old, task))
+
+    # Old hours of a changed task stay in the schedule until its row is accepted
+    schedule = TaskLoad.get_schedule()
+    actions = []
+    tasks = []
+    added = []
+    updated = []
+    for old, task in rows:
+        if task is None:
+            actions.append(ImportRow.rejected if old is None else ImportRow.unchanged)
+            tasks.append(old)
+            continue
+        if old is not None and old.status != Task.completed:
+            schedule.remove(old.start, old.deadline,
+                old.estimated_duration - old.actual_duration)
+        fits = schedule.enough_time(task)
+        kept = task if fits else old
+        if kept is not None and kept.status != Task.completed:
+            schedule.insert(kept.start, kept.deadline,
+                kept.estimated_duration - kept.actual_duration)
+        if not fits:
+            actions.append(ImportRow.rejected)
+            tasks.append(None)
+            continue
+        (added if old is None else updated).append(task)
+        actions.append(ImportRow.added if old is None else ImportRow.updated)
+        tasks.append(task)
+    seen.update(old.id for old, _ in rows if old is not None)
+    seen.update(matched)
+
+    Task.objects.bulk_create(added)
+    Task.objects.bulk_update(updated, fields + ('category', 'external_id'))
+    seen.update(task.id for task in added)
+    # Bulk writes skip Task.save, so loads are replaced here
+    TaskLoad.objects.filter(task_id__in=[task.id for task in updated]).delete()
+    TaskLoad.objects.bulk_create([TaskLoad.of_task(task) for task in added + updated
+        if task.status != Task.completed])
+    return actions, tasks
+
+def delete_unseen(seen, chunk_size=500):
+    """
+    Removes open tasks that came from imports, by external id or
+    import rows, with ids not in seen. Tasks added by hand and
+    completed tasks are kept. Returns how many were removed.
+    """
+    imported = Task.objects.exclude(status=Task.completed).filter(
+        Q(external_id__isnull=False) | Q(import_rows__isnull=False))
+    unseen = sorted(set(imported.values_list('id', flat=True)) - seen)
+    for index in range(0, len(unseen), chunk_size):
+        Task.objects.filter(id__in=unseen[index:index + chunk_size]).delete()
+    return len(unseen)
+
+def iter_batches(rows, size):
+    """
+    Yields lists of at most size rows
+    """
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def task_from_json(data):
+    """
+    Creates unsaved task from JSON object with ISO dates,
+    raises ValueError if it is not a valid task
+    """
+    try:
+        task = Task(
+            description=str(data.get('description', '')),
+            start=date.fromisoformat(data['start']),
+            deadline=date.fromisoformat(data['deadline']),
+            estimated_duration=int(data.get('estimated_duration', 0)),
+            actual_duration=int(data.get('actual_duration', 0)),
+            status=data.get('status', Task.not_started)
+        )
+    except (KeyError, TypeError, AttributeError) as error:
+        raise ValueError(f'Invalid task: {data}') from error
+    if task.deadline < task.start:
+        raise ValueError(f'Deadline may not be prior to start date: {data}')
+    return task
 
-    else:
-        messages.add_message(request, messages.ERROR,
-            'Not allowed filed, please import JSON or CSV file.')
-    if len(not_schdueled) > 0:
-        messages.add_message(request, messages.ERROR,
-            f'The following tasks chould not be scheduled: {", ".join(not_schdueled)}')
+def availability_from_json(data):
+    """
+    Creates unsaved availability from JSON object,
+    raises ValueError if it is not a valid availability
+    """
+    form = AvailabilityForm(data)
+    if not form.is_valid():
+        raise ValueError(f'Invalid availability: {data}')
+    return form.save(commit=False)
 
-    if len(schdueled) > 0:
-        messages.add_message(request, messages.SUCCESS,
-            f'The following tasks were scheduled: {", ".join(schdueled)}')
+def iter_json_tasks(file, chunk_size=None):
+    """
+    Yields objects of JSON array in file one at a time,
+    reading the file in chunks
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8-sig')()
+    chunks = file.chunks(chunk_size)
+    buffer = ''
+    started = False
+    done = False
+    while True:
+        buffer = buffer.lstrip()
+        if not started and buffer:
+            if buffer[0] != '[':
+                raise ValueError('Expected JSON array of tasks')
+            buffer = buffer[1:]
+            started = True
+            continue
+        if started and buffer[:1] == ',':
+            buffer = buffer[1:]
+            continue
+        if started and buffer[:1] == ']':
+            return
+        if started and buffer:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if done:
+                    raise
+            else:
+                buffer = buffer[end:]
+                yield item
+                continue
+        if done:
+            raise ValueError('Unexpected end of JSON array')
+        chunk = next(chunks, None)
+        if chunk is None:
+            done = True
+            buffer += text.decode(b'', final=True)
+        else:
+            buffer += text.decode(chunk)
 
 def availability_exists():
     """
@@ -108,7 +279,53 @@ def availability_exists():
     exists in database
     """
     try:
-        Availability.objects.get(id=1)
+        Availability.get_cached()
         return True
     except ObjectDoesNotExist:
         return False
+
+def encode_cursor(task):
+    """
+    Creates page cursor from task status, deadline and id
+    """
+    return f'{task.status}.{task.deadline.isoformat()}.{task.id}'
+
+def decode_cursor(cursor):
+    """
+    Reads status, deadline and id from page cursor,
+    raises ValueError if cursor is not valid
+    """
+    status, deadline, task_id = cursor.split('.')
+    return status, date.fromisoformat(deadline), int(task_id)
+
+def paginate_tasks(tasks, after=None, before=None, per_page=TASKS_PER_PAGE):
+    """
+    Gets page of tasks ordered by status descending, deadline and id,
+    starting after or ending before a cursor, so pages stay the same
+    when tasks are added. Returns tasks and cursors of next and
+    previous page, cursors are None when there is no such page.
+    Raises ValueError if cursor is not valid
+    """
+    tasks = tasks.select_related('category')
+    if before:
+        status, deadline, task_id = decode_cursor(before)
+        page = list(tasks.filter(Q(status__gt=status)
+            | Q(status=status, deadline__lt=deadline)
+            | Q(status=status, deadline=deadline, id__lt=task_id)
+        ).order_by('status', '-deadline', '-id')[:per_page + 1])
+        if not page:
+            return paginate_tasks(tasks, per_page=per_page)
+        has_previous = len(page) > per_page
+        page = page[:per_page][::-1]
+        return page, encode_cursor(page[-1]), \
+            encode_cursor(page[0]) if has_previous else None
+    if after:
+        status, deadline, task_id = decode_cursor(after)
+        tasks = tasks.filter(Q(status__lt=status)
+            | Q(status=status, deadline__gt=deadline)
+            | Q(status=status, deadline=deadline, id__gt=task_id))
+    page = list(tasks.order_by('-status', 'deadline', 'id')[:per_page + 1])
+    has_next = len(page) > per_page
+    page = page[:per_page]
+    return page, encode_cursor(page[-1]) if has_next else None, \
+        encode_cursor(page[0]) if after and page else None
@@ -3,120 +3,163 @@ Functions for Task Scheduler views
 """
 
 import datetime
-from time import time
-import plotly.express as px
-import pandas as pd
+import json
 
+from django.core.cache import cache
+from django.utils import timezone
+from django.views.decorators.http import condition
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.shortcuts import render, redirect
-from django.db.models import Q
+from django.urls import reverse
 from django.contrib import messages
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
 
-from .models import Availability, Task, Category
+from .models import Availability, Task, Category, DataVersion, ImportJob
+from .search import find_tasks
 from .forms import AvailabilityForm, TaskForm, UploadFileForm
-from .utils import handle_uploaded_file, get_category_object, availability_exists
-
-def get_possible_deadlines(tasks):
-    """
-    Creates array of objects if overtime is needed
-    on any task
-    """
-    deadlines = []
-    ot_tasks = []
-    for task in tasks:
-        old = task.deadline
-        new = task.get_new_deadline(None if not ot_tasks else ot_tasks)
-        if task.status != 'C' and old != new:
-            deadlines.append({
-                'Task': task.description,
-                'Start': old + datetime.timedelta(days=1),
-                'Deadline': new,
-                'End': new + datetime.timedelta(days=1),
-                'Status': 'Overtime needed',
-                'Category': task.category.name,
-                'Hours left': task.estimated_duration - task.actual_duration
-            })
-            ot_tasks.append(task)
-    return deadlines
+from .utils import get_category_object, availability_exists, \
+    task_from_json, availability_from_json, paginate_tasks
+from . import exports, scheduler
 
+def get_data_version(request):
+    """
+    Gets data version once per request
+    """
+    if not hasattr(request, 'data_version'):
+        request.data_version = DataVersion.get()
+    return request.data_version
+
+def timeline_etag(request):
+    """
+    ETag of timeline, which changes with data and date.
+    None while messages are waiting to be shown
+    """
+    if len(messages.get_messages(request)) > 0:
+        return None
+    return f'{get_data_version(request).key()}-{datetime.date.today()}'
+
+def timeline_last_modified(request):
+    """
+    Last change of timeline data, or start of
+    today if data changed before today
+    """
+    midnight = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(get_data_version(request).changed, midnight)
+
+@condition(etag_func=timeline_etag, last_modified_func=timeline_last_modified)
 def index(request):
     """
     Index of task scheduler
     """
-    tasks = Task.objects.all().order_by('start', '-deadline')
-
-    context = {}
-    if tasks:
-        week = (604800 * 1000)
-        today = time() * 1000
-        colors = {
-            'Not started': '#6c757d',
-            'Ongoing': '#ffca3a',
-            'Completed': '#8ac926',
-            'Overtime needed': 'rgba(255, 89, 94, 0.5)',
-        }
-        task_data = [
+    key = f'tasks:timeline-window:{get_data_version(request).key()}-{datetime.date.today()}'
+    timeline = cache.get(key)
+    if timeline is None:
+        if Task.objects.exists():
+            # Plotly is only imported once a chart has to be built
+            from .timeline import build_timeline  # pylint: disable=import-outside-toplevel
+            timeline = build_timeline()
+        else:
+            timeline = {'chart': None, 'overtime': True}
+        cache.set(key, timeline, 60 * 60 * 24)
+
+    if not timeline['overtime']:
+        messages.add_message(request, messages.ERROR,
+            "Not able to calculate overtime, 0 Available hours")
+    return render(request, "timeline.html", {
+        'data': timeline['chart'],
+        'start': timeline.get('start'),
+        'end': timeline.get('end')
+    })
+
+
+def timeline_data(request):
+    """
+    Returns timeline traces of tasks between start and end dates
+    that are not between loaded_start and loaded_end, as JSON
+    """
+    if not availability_exists():
+        return JsonResponse({'error': 'No available hours'}, status=400)
+    try:
+        start = datetime.date.fromisoformat(request.GET['start'])
+        end = datetime.date.fromisoformat(request.GET['end'])
+        loaded = None
+        if 'loaded_start' in request.GET:
+            loaded = (datetime.date.fromisoformat(request.GET['loaded_start']),
+                datetime.date.fromisoformat(request.GET['loaded_end']))
+    except (KeyError, ValueError) as error:
+        return JsonResponse({'error': f'Invalid window: {error}'}, status=400)
+    from .timeline import get_window_traces  # pylint: disable=import-outside-toplevel
+    return JsonResponse({'start': start, 'end': end,
+        'traces': get_window_traces(start, end, loaded)})
+
+
+def task_plan(request):
+    """
+    Returns hours per day given to each open task as JSON
+    """
+    if not availability_exists():
+        return JsonResponse({'error': 'No available hours'}, status=400)
+    tasks = Task.objects.exclude(status=Task.completed).order_by('deadline', 'id')
+    plan = scheduler.Plan(tasks, Availability.get_cached().get_calendar())
+    return JsonResponse({
+        'days': [
             {
-                'Task': task.description,
-                'Start': task.start,
-                'Deadline': task.deadline,
-                'End': task.deadline + datetime.timedelta(days=1),
-                'Status': task.get_status_display(),
-                'Category': task.category.name,
-                'Hours left': task.estimated_duration - task.actual_duration
-            } for task in tasks if task.deadline >= \
-                (datetime.date.today() - datetime.timedelta(days = 14)
-                or task.status != 'C')
+                'date': day,
+                'hours': sum(hours for _, hours in allocated),
+                'tasks': [{'id': task.id, 'description': task.description, 'hours': hours}
+                    for task, hours in allocated]
+            } for day, allocated in plan.daily().items()
+        ],
+        'late': [
+            {'id': task.id, 'deadline': task.deadline, 'finish': finish}
+            for task, finish in plan.late()
         ]
-        if Availability.objects.get(id=1).get_hour_per_week() > 0:
-            deadlines = get_possible_deadlines(tasks)
-            data_frame = pd.DataFrame((task_data + deadlines))
-        else:
-            data_frame = pd.DataFrame((task_data))
-            messages.add_message(request, messages.ERROR,
-                "Not able to calculate overtime, 0 Available hours")
-
-        hover = {
-            'Task': False,
-            'Start': '|%b %e',
-            'Deadline': '|%b %e',
-            'End': False,
-            'Status': True,
-            'Category': True,
-            'Hours left': True
-        }
-        fig = px.timeline(data_frame, x_start="Start", x_end="End", y="Task", color="Status",
-            color_discrete_map=colors, hover_data=hover,
-            hover_name="Task", range_y=[0,len(tasks) - 1],
-            range_x=[today - week, today + week])
-        fig.update_layout(dragmode='pan',
-        font_color='#10002B',
-        font_family='Montserrat',
-        title={
-            'text': "Task Timeline",
-            'xanchor': 'center',
-            'yanchor': 'top',
-            'y':1,
-            'x':0.3,
-            'font':{'size':28 }
-            }
-            )
-        fig.update_yaxes(autorange="reversed", title=None, automargin=True)
-        fig.update_xaxes(
-            tickformat="%a %e/%m \n w.%W",
-            type = 'date',
-            tickformatstops=(dict(dtickrange=[None, 604800000], value="%a %e/%m \n w.%W"),
-                dict(dtickrange=[604800000, "M1"], value="w.%W"),
-                dict(dtickrange=["M1", "M12"], value="%b %Y"),
-                dict(dtickrange=["M12", None], value="%Y Y"))
-        )
-        fig.add_vline(x=today, line_width=2, line_color="#10002B",
-            annotation={'text': 'Now', 'font': {'size': 14, 'color': '#10002B'},
-            'yshift': 20, 'xshift': -15})
-        chart = fig.to_html()
-        context['data'] = chart
-
-    return render(request, "timeline.html", context)
+    })
+
+
+@csrf_exempt
+@require_POST
+def task_simulate(request):
+    """
+    Evaluates hypothetical tasks and availability against
+    current tasks as JSON, nothing is saved
+    """
+    if not availability_exists():
+        return JsonResponse({'error': 'No available hours'}, status=400)
+    try:
+        scenarios = [
+            (
+                [task_from_json(task) for task in scenario.get('tasks', [])],
+                availability_from_json(scenario['availability'])
+                    if scenario.get('availability') else None
+            ) for scenario in json.loads(request.body)['scenarios']
+        ]
+    except (ValueError, KeyError, TypeError, AttributeError) as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    tasks = list(Task.objects.exclude(status=Task.completed).order_by('deadline', 'id'))
+    results = scheduler.simulate(tasks, Availability.get_cached(), scenarios)
+    return JsonResponse({
+        'scenarios': [
+            {
+                'tasks': [
+                    {
+                        'description': checked['task'].description,
+                        'fits': checked['fits'],
+                        'deadline': checked['deadline'],
+                        'start': checked['start']
+                    } for checked in result['tasks']
+                ],
+                'overtime': [
+                    {'description': task.description, 'deadline': task.deadline,
+                        'projected': deadline}
+                    for task, deadline in result['overtime']
+                ]
+            } for result in results
+        ]
+    })
 
 
 def add_task(request):
@@ -134,17 +177,26 @@ def add_task(request):
     if request.method == 'POST':
         form  = TaskForm(request.POST)
         current_category = request.POST['category']
+        # Suggestions of a rejected task are worked out without the write lock
         if form.is_valid():
             obj = form.save(commit=False)
             obj.category = get_category_object(request.POST['category'])
-            if obj.enough_time():
-                obj.save()
+            # Capacity is checked again and task saved while holding the write lock
+            with transaction.atomic():
+                fits = obj.get_schedule().enough_time(obj)
+                if fits:
+                    obj.save()
+            if fits:
                 messages.add_message(request, messages.SUCCESS, 'Task was added sucessfully')
                 return redirect('all tasks')
-            suggested_deadline = obj.get_new_deadline()
-            messages.add_message(request, messages.ERROR,\
-                f'Not enough time to complete task before deadline, \
-                    next possible deadline is {suggested_deadline}')
+            suggested_deadline = obj.get_new_deadline(obj.get_schedule())
+            if suggested_deadline is None:
+                messages.add_message(request, messages.ERROR,\
+                    'Not enough time to complete task with current availability')
+            else:
+                messages.add_message(request, messages.ERROR,\
+                    f'Not enough time to complete task before deadline, \
+                        next possible deadline is {suggested_deadline}')
     context = {
         'form': form,
         'categories': categories,
@@ -155,18 +207,9 @@ def add_task(request):
 
 def search_tasks(request):
     """
-    Renders template that shows all tasks as a list
+    Finds tasks matching search query and status
     """
-    query = request.GET['q']
-    status = request.GET['status']
-    if query is not None:
-        categories = Category.objects.filter(name__contains=query).values_list('id', flat=True)
-        q_category = Q(category__in=list(categories))
-        q_description = Q(description__contains=query)
-        tasks = Task.objects.filter(q_description | q_category)
-        if status != '':
-            tasks = Task.objects.filter(q_description | q_category, status=status)
-    return tasks
+    return find_tasks(request.GET['q'], request.GET['status'])
 
 def show_tasks(request):
     """
@@ -179,19 +222,56 @@ def show_tasks(request):
         q_value = request.GET['q']
         status_value = request.GET['status']
     else:
-        tasks = Task.objects.all().order_by('-status', 'deadline')
+        tasks = Task.objects.all()
+    try:
+        tasks, next_page, previous_page = paginate_tasks(tasks,
+            request.GET.get('after'), request.GET.get('before'))
+    except ValueError:
+        tasks, next_page, previous_page = paginate_tasks(tasks)
 
     context = {
         'tasks': tasks,
         'title': "Task List",
         'q': q_value,
         'status': status_value,
+        'next_page': page_query(request, 'after', next_page),
+        'previous_page': page_query(request, 'before', previous_page),
     }
     return render(request, 'all_tasks.html', context)
 
+def export_tasks(request):
+    """
+    Streams tasks matching search query and status as
+    CSV, JSON or NDJSON file, in the format tasks are imported in
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in exports.FORMATS:
+        return JsonResponse({'error': f'Unknown format: {export_format}'}, status=400)
+    tasks = find_tasks(request.GET.get('q', ''), request.GET.get('status', ''))
+    if not request.GET.get('q'):
+        tasks = tasks.order_by('id')
+    rows, content_type, extension = exports.FORMATS[export_format]
+    response = StreamingHttpResponse(rows(tasks), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="tasks.{extension}"'
+    return response
+
+def page_query(request, key, cursor):
+    """
+    Creates query string of current request for page
+    starting after or ending before cursor
+    """
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
+    query[key] = cursor
+    return query.urlencode()
+
 def import_tasks(request):
     """
-    Renders template that shows all tasks as a list
+    Renders import template, stores uploaded file
+    as an import job for the import worker
     """
     import_form = UploadFileForm()
 
@@ -202,15 +282,37 @@ def import_tasks(request):
     if request.method == "POST":
         form = UploadFileForm(request.POST, request.FILES)
         if form.is_valid():
-            handle_uploaded_file(request)
+            file = request.FILES['file']
+            if not file.name.endswith(("json", "csv")):
+                messages.add_message(request, messages.ERROR,
+                    'Not allowed filed, please import JSON or CSV file.')
+            else:
+                job = ImportJob.objects.create(file=file, name=file.name,
+                    mode=form.cleaned_data['mode'])
+                return redirect(f'{reverse("import tasks")}?job={job.id}')
 
+    job = None
+    if request.GET.get('job', '').isdigit():
+        job = ImportJob.objects.filter(id=request.GET['job']).first()
     context = {
         'title': "Import Tasks",
-        'import_form': import_form
+        'import_form': import_form,
+        'job': job
     }
     return render(request, 'import_tasks.html', context)
 
 
+def import_progress(request, job_id):
+    """
+    Returns progress of import job as JSON
+    """
+    try:
+        job = ImportJob.objects.get(id=job_id)
+    except ObjectDoesNotExist:
+        return JsonResponse({'error': 'No such import'}, status=404)
+    return JsonResponse(job.progress())
+
+
 def show_categories(request):
     """
     Renders template that shows all categories as a list